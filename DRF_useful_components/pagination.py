@@ -1,6 +1,96 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.db import connections
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'pageSize'  # 允许通过查询参数设置页面大小
     page_query_param = 'startPages'  # 允许通过查询参数设置当前页
     max_page_size = 100  # 可选，设置最大页面大小
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    游标（keyset）分页：按索引列定位下一页，不执行 COUNT(*) 和 OFFSET，翻到很深的页也不会变慢。
+    - 页面大小沿用 pageSize 参数。
+    - 默认按 -id 排序，视图可以通过 cursor_ordering 指定，排序字段需有索引。
+    - DRF 的游标只记录第一个排序字段的值，后续字段只决定顺序；第一个字段值相同的行通过游标中的
+      offset 跳过，重复值越多越接近 OFFSET 分页。因此第一个排序字段应唯一（如 -id）或几乎唯一
+      （如微秒精度的 -created_at），('-created_at', '-id') 并不是真正的复合 keyset。
+    - 总数默认不返回；withCount=exact 返回精确总数，withCount=estimate 在 PostgreSQL 上
+      返回查询计划估算的行数（其它数据库退化为精确总数）。
+
+    使用方式：在视图上设置 pagination_class = CustomCursorPagination，
+    或混入 CursorPaginationOptInMixin 由请求参数按需切换（不改变已有接口的默认分页）。
+    """
+    page_size_query_param = 'pageSize'
+    max_page_size = 100
+    ordering = '-id'
+    count_query_param = 'withCount'
+
+    def get_ordering(self, request, queryset, view):
+        cursor_ordering = getattr(view, 'cursor_ordering', None)
+        if cursor_ordering:
+            return (cursor_ordering,) if isinstance(cursor_ordering, str) else tuple(cursor_ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count_mode = request.query_params.get(self.count_query_param)
+        if count_mode == 'estimate':
+            self.count = self.get_estimated_count(queryset)
+        elif count_mode == 'exact':
+            self.count = queryset.count()
+        else:
+            self.count = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_estimated_count(self, queryset):
+        """
+        使用 EXPLAIN 读取 PostgreSQL 查询计划的估算行数，代价与查询规划相当，不扫描数据。
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return queryset.count()
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data['count'] = self.count
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        return schema
+
+
+class CursorPaginationOptInMixin:
+    """
+    视图混入：请求带 paginate=cursor（或已带 cursor 参数）时使用游标分页，否则沿用视图的 pagination_class，
+    已有客户端的 startPages / count 响应格式保持不变。
+    游标模式的排序由视图的 cursor_ordering 指定（默认 -id），第一个排序字段应唯一或几乎唯一，
+    原因见 CustomCursorPagination。
+    需放在视图基类之前，例如 class UserViewSet(CursorPaginationOptInMixin, viewsets.ModelViewSet)。
+    """
+    cursor_pagination_class = CustomCursorPagination
+    pagination_mode_query_param = 'paginate'
+
+    def use_cursor_pagination(self):
+        query_params = self.request.query_params
+        return query_params.get(self.pagination_mode_query_param) == 'cursor' \
+            or self.cursor_pagination_class.cursor_query_param in query_params
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.use_cursor_pagination():
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
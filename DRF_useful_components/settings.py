@@ -171,6 +171,20 @@ CELERY_ACCEPT_CONTENT = ['json']  # 接受的消息格式
 CELERY_TASK_SERIALIZER = 'json'  # 任务序列化格式
 
 
+# ==========================
+# Cache Configuration / 缓存配置
+# ==========================
+# RBAC 版本号、权限缓存和导入进度需要在所有 Web（Daphne）进程和 Celery worker 之间共享，
+# 不能使用默认的进程内 LocMemCache（各进程各自计数，权限变更后其它进程会继续使用旧缓存）。
+# 这里复用 Celery 使用的 Redis 实例（db 1）。
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_REDIS_URL', default='redis://localhost:6379/1'),
+    }
+}
+
+
 # ==========================
 # Email Configuration / 邮件配置
 # ==========================
@@ -208,6 +222,33 @@ SIMPLE_JWT = {
 }
 
 
+# ==========================
+# RBAC Configuration / 权限配置
+# ==========================
+RBAC_CACHE_TIMEOUT = 60 * 60  # 用户权限缓存有效期（秒），RBAC 数据变化时通过版本号自动失效
+RBAC_JWT_CLAIMS = False  # 是否在访问令牌中写入角色/权限摘要，开启后用户信息、菜单接口无需查询数据库
+# 是否按 rbac_permissions 校验接口操作权限（RbacPermission）。关闭时放行所有请求；
+# 开启前先为角色分配 rbac: 前缀的操作权限（迁移 rbac_app.0004 写入），否则非超级用户访问管理接口会返回 403
+RBAC_ENFORCE_PERMISSIONS = False
+
+# 登录密码校验在有界线程池中执行，异步视图 await 校验结果，不阻塞事件循环
+AUTHENTICATION_BACKENDS = ['rbac_app.backends.PooledModelBackend']
+RBAC_LOGIN_HASH_WORKERS = None  # 登录校验线程数，None 表示 CPU 核数
+
+# 密码哈希策略：PASSWORD_HASHERS 第一项为当前策略，修改参数或顺序后，用户下次登录时自动按新策略重新哈希
+# Argon2 需要安装 argon2-cffi（pip install argon2-cffi）
+# 各策略的单核登录吞吐量可通过 python manage.py benchmark_login 测量
+PASSWORD_HASHERS = [
+    'rbac_app.hashers.ConfigurablePBKDF2PasswordHasher',
+    'rbac_app.hashers.ConfigurableScryptPasswordHasher',
+    'rbac_app.hashers.ConfigurableArgon2PasswordHasher',
+]
+RBAC_PASSWORD_HASH_PARAMS = {
+    'pbkdf2_sha256': {'iterations': 870000},  # Django 5.1 默认值
+    'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+    'argon2': {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1},  # OWASP 推荐的最低配置
+}
+
 # 设置上传文件大小限制
 
 MAX_UPLOAD_SIZES = {
@@ -218,6 +259,13 @@ MAX_UPLOAD_SIZES = {
     'archives': 50 * 1024 * 1024,  # 最大压缩文件上传大小：50MB
     'others': 10 * 1024 * 1024,  # 其他文件类型上传大小：10MB
 }
+
+# 分片上传的组装方式：
+# 'chunks' 每个分片保存为独立文件，完成时合并；
+# 'preallocate' 首个分片预分配目标文件，分片按偏移直接写入，完成时只做重命名（需要客户端传 chunkSize 和 fileSize）
+UPLOAD_ASSEMBLY_MODE = 'chunks'
+# 分片上传会话的有效期，每收到一个分片顺延；过期会话由 clean_upload_sessions 命令清理
+UPLOAD_SESSION_TTL = timedelta(days=1)
 import os
 
 # MEDIA_URL 用于生成可公开访问的文件 URL
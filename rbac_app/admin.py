@@ -1,8 +1,20 @@
 from django.contrib import admin
 from .models import Role, Permission, UserRole, RolePermission, CustomUser
+from .utils import rebuild_permission_paths
+
+
+class PermissionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'codename', 'parent_id', 'path')
+    search_fields = ('name', 'codename')
+
+    def delete_queryset(self, request, queryset):
+        # 批量删除绕过了 Permission.delete()，需要重新计算子孙节点的 path
+        super().delete_queryset(request, queryset)
+        rebuild_permission_paths()
+
 
 admin.site.register(CustomUser)
 admin.site.register(Role)
-admin.site.register(Permission)
+admin.site.register(Permission, PermissionAdmin)
 admin.site.register(UserRole)
 admin.site.register(RolePermission)
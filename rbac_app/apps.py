@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RbacAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rbac_app'
+
+    def ready(self):
+        # 注册权限缓存失效的信号处理
+        from . import signals  # noqa: F401
+        # 注册共享缓存的系统检查
+        from . import checks  # noqa: F401
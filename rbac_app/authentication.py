@@ -0,0 +1,157 @@
+# rbac/authentication.py
+# ==========================
+# RBAC JWT Authentication / 基于令牌声明的 JWT 认证
+# ==========================
+# 开启 settings.RBAC_JWT_CLAIMS 后，登录和刷新签发的访问令牌中包含角色 ID 列表、
+# RBAC 版本号和常用用户信息。认证时直接由令牌声明构造用户对象，不读取数据库；
+# 令牌中的版本号落后于当前 RBAC 版本时，只比对该用户当前的角色 ID 和账号状态（带缓存）：
+# 用户被禁用或删除时拒绝认证，角色或超级用户标志发生变化时返回 401 要求刷新令牌，
+# 其他用户或其他角色的写入不会使令牌失效。禁用、降级用户都会递增版本号（见 signals）。
+# 角色的权限不写入令牌，始终按当前版本从缓存读取，因此修改角色权限无需刷新令牌。
+
+import asyncio
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import SynchronousOnlyOperation
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from rest_framework_simplejwt.views import TokenRefreshView
+
+from .utils import get_rbac_version, aget_rbac_version, get_user_role_ids, aget_user_role_ids, \
+    get_user_account_flags, aget_user_account_flags, get_effective_permissions, add_rbac_claims
+
+
+class RbacTokenUser(TokenUser):
+    """
+    由令牌声明构造的惰性用户对象。
+    令牌中存在的字段直接返回；访问令牌中没有的字段时才从数据库加载完整用户（只加载一次）。
+    异步视图中不能隐式查询数据库，需先 await user.aget_db_user()，之后再访问这些字段。
+    """
+
+    @property
+    def role_ids(self):
+        return self.token.get('roles', [])
+
+    @property
+    def rbac_version(self):
+        return self.token.get('rbac_version')
+
+    def get_db_user(self):
+        if '_db_user' not in self.__dict__:
+            self.__dict__['_db_user'] = get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self.id})
+        return self.__dict__['_db_user']
+
+    async def aget_db_user(self):
+        if '_db_user' not in self.__dict__:
+            self.__dict__['_db_user'] = await get_user_model().objects.aget(**{api_settings.USER_ID_FIELD: self.id})
+        return self.__dict__['_db_user']
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        if '_db_user' not in self.__dict__ and _in_event_loop():
+            raise SynchronousOnlyOperation(
+                f"'{attr}' is not in the access token, load the user with 'await user.aget_db_user()' first."
+            )
+        return getattr(self.get_db_user(), attr)
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class RbacJWTAuthentication(JWTAuthentication):
+    """
+    令牌包含 RBAC 声明时返回 RbacTokenUser（不查询数据库），否则退回默认的 JWTAuthentication 行为。
+    """
+
+    def get_user(self, validated_token):
+        if 'rbac_version' not in validated_token:
+            return super().get_user(validated_token)
+
+        user = RbacTokenUser(validated_token)
+        if validated_token['rbac_version'] != get_rbac_version():
+            self.check_stale_claims(user, get_user_account_flags(user), get_user_role_ids(user))
+        return user
+
+    @staticmethod
+    def check_stale_claims(user, flags, role_ids):
+        """
+        令牌版本号过期时，将令牌中的声明与用户当前的账号状态、角色比对。
+        """
+        if not flags:
+            raise AuthenticationFailed("用户不存在", code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not flags['is_active']:
+            raise AuthenticationFailed("用户已被禁用", code="user_inactive")
+        if user.token.get('is_superuser', False) != flags['is_superuser'] or user.role_ids != role_ids:
+            raise InvalidToken("角色已变更，请刷新令牌")
+
+    async def aauthenticate(self, request):
+        """
+        异步认证（供 AsyncAPIView 使用）：令牌解析为纯计算，版本号读取异步缓存，
+        没有 RBAC 声明时通过异步 ORM 加载用户。
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if 'rbac_version' in validated_token:
+            user = RbacTokenUser(validated_token)
+            if validated_token['rbac_version'] != await aget_rbac_version():
+                self.check_stale_claims(user, await aget_user_account_flags(user), await aget_user_role_ids(user))
+            return user
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("令牌中没有用户标识")
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed("用户不存在", code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("用户已被禁用", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("密码已修改，请重新登录", code="password_changed")
+        return user
+
+
+class RbacTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    刷新访问令牌时重新写入最新的 RBAC 声明，使过期的权限摘要通过刷新得到更新。
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        if not getattr(settings, 'RBAC_JWT_CLAIMS', False):
+            return data
+
+        access = AccessToken(data['access'])
+        user = get_user_model().objects.get(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]})
+        version = get_rbac_version()
+        add_rbac_claims(access, user, get_effective_permissions(user)['role_ids'], version)
+        data['access'] = str(access)
+        return data
+
+
+class RbacTokenRefreshView(TokenRefreshView):
+    serializer_class = RbacTokenRefreshSerializer
@@ -0,0 +1,93 @@
+# rbac/backends.py
+# ==========================
+# Pooled Authentication Backend / 线程池校验密码的认证后端
+# ==========================
+# 与 ModelBackend 行为一致，但密码校验（CPU 密集）在有界线程池中执行：
+# - 同步视图：并发校验数量不超过 RBAC_LOGIN_HASH_WORKERS，避免登录高峰占满所有 CPU；
+# - 异步视图（aauthenticate）：await 线程池结果，不阻塞事件循环。
+# hashlib（PBKDF2/scrypt）与 argon2-cffi 计算期间会释放 GIL，线程池可以利用多核。
+# 数据库读写始终在请求线程中完成，线程池中只做纯计算。
+# 密码正确且哈希不符合当前策略时，重新哈希后只更新 password 字段（登录时透明升级）。
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password
+from django.utils.crypto import get_random_string
+
+from .hashing import verify_and_rehash
+
+_executor = None
+
+
+def get_login_executor():
+    """
+    惰性创建登录校验线程池，线程数由 RBAC_LOGIN_HASH_WORKERS 配置（默认 CPU 核数）。
+    """
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, 'RBAC_LOGIN_HASH_WORKERS', None) or os.cpu_count() or 1
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='login-hash')
+    return _executor
+
+
+def _fake_verify(raw_password):
+    # 用户不存在时也执行一次哈希，缩小与存在用户之间的响应时间差
+    make_password(raw_password or get_random_string(12))
+    return False, None
+
+
+class PooledModelBackend(ModelBackend):
+
+    """
+    在 settings.AUTHENTICATION_BACKENDS 中替换 ModelBackend 即可，
+    LoginView 与 JWT_app 的 UserLoginView 都通过 authenticate() 使用它。
+    """
+
+    def _get_username(self, username, kwargs):
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        return username
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        username = self._get_username(username, kwargs)
+        if username is None or password is None:
+            return None
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            get_login_executor().submit(_fake_verify, password).result()
+            return None
+        is_correct, new_encoded = get_login_executor().submit(verify_and_rehash, password, user.password).result()
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if new_encoded:
+            user.password = new_encoded
+            user.save(update_fields=['password'])
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        username = self._get_username(username, kwargs)
+        if username is None or password is None:
+            return None
+        UserModel = get_user_model()
+        loop = asyncio.get_running_loop()
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            await loop.run_in_executor(get_login_executor(), _fake_verify, password)
+            return None
+        is_correct, new_encoded = await loop.run_in_executor(
+            get_login_executor(), verify_and_rehash, password, user.password
+        )
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if new_encoded:
+            user.password = new_encoded
+            await user.asave(update_fields=['password'])
+        return user
@@ -0,0 +1,25 @@
+# rbac/checks.py
+# 系统检查：RBAC 缓存失效依赖所有进程共享同一个版本号，默认缓存为进程内缓存时给出警告。
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHE_BACKENDS = {'django.core.cache.backends.locmem.LocMemCache'}
+
+
+def is_cache_process_local():
+    return settings.CACHES.get(DEFAULT_CACHE_ALIAS, {}).get('BACKEND') in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if not is_cache_process_local():
+        return []
+    return [Warning(
+        'The default cache is process-local, so RBAC version bumps are not shared between processes.',
+        hint='Web and Celery processes may keep serving stale permissions, menus and ETags for up to '
+             'RBAC_CACHE_TIMEOUT, and import progress written by Celery is not visible to the web process. '
+             'Configure a shared backend such as django.core.cache.backends.redis.RedisCache.',
+        id='rbac_app.W001',
+    )]
@@ -0,0 +1,137 @@
+# rbac/dataset.py
+# ==========================
+# Synthetic RBAC Dataset / 合成测试数据
+# ==========================
+# 批量生成用户、角色、权限树及其关系，用于 EXPLAIN 检查和性能基准。
+# 使用 bulk_create 分批写入，不触发信号，结束时统一递增 RBAC 版本号。
+
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import CustomUser, Role, Permission, UserRole, RolePermission
+from .utils import bump_rbac_version, rebuild_permission_paths
+
+DATASET_PREFIX = 'synthetic'
+DATASET_BATCH_SIZE = 1000
+# 权限树每个节点的子节点数
+DATASET_TREE_FANOUT = 10
+# 合成用户的统一密码
+DATASET_PASSWORD = 'synthetic-Passw0rd'
+
+
+def permission_tree_parents(permissions, depth, fanout):
+    """
+    按层生成权限树结构：第一层 fanout 个根节点，之后每个节点 fanout 个子节点，最多 depth 层。
+    :param permissions: 权限总数上限，None 表示生成完整的树
+    :return: 每个节点的父节点下标列表（根节点为 None）
+    """
+    parents = []
+    level = [None] * fanout
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            if permissions is not None and len(parents) >= permissions:
+                return parents
+            parents.append(parent)
+            next_level.extend([len(parents) - 1] * fanout)
+        level = next_level
+    return parents
+
+
+@transaction.atomic
+def generate_dataset(users=1000, roles=20, permissions=200, roles_per_user=2, permissions_per_role=30,
+                     depth=3, fanout=DATASET_TREE_FANOUT, seed=0, password=DATASET_PASSWORD):
+    """
+    生成合成数据集，用户名、角色名、权限名均以 DATASET_PREFIX 开头，便于识别和清理。
+    权限组成最多 depth 层、每个节点 fanout 个子节点的树（见 permission_tree_parents）。
+    用户、角色、权限均批量写入，每个用户随机分配 roles_per_user 个角色，
+    每个角色随机分配 permissions_per_role 个权限。
+    :return: 各表写入的行数
+    """
+    rng = random.Random(seed)
+    roles_per_user = min(roles_per_user, roles)
+
+    # 名称唯一，重复生成时从已有数量之后继续编号
+    role_start = Role.objects.filter(name__startswith=f'{DATASET_PREFIX}_role_').count()
+    perm_start = Permission.objects.filter(name__startswith=f'{DATASET_PREFIX}_perm_').count()
+    user_start = CustomUser.objects.filter(username__startswith=f'{DATASET_PREFIX}_user_').count()
+
+    role_objs = Role.objects.bulk_create(
+        [Role(name=f'{DATASET_PREFIX}_role_{role_start + i}') for i in range(roles)],
+        batch_size=DATASET_BATCH_SIZE
+    )
+
+    # 先平铺写入再设置父节点，最后统一重建 path
+    parents = permission_tree_parents(permissions, depth, fanout)
+    permission_objs = Permission.objects.bulk_create(
+        [Permission(name=f'{DATASET_PREFIX}_perm_{perm_start + i}', codename=f'{DATASET_PREFIX}_perm_{perm_start + i}')
+         for i in range(len(parents))],
+        batch_size=DATASET_BATCH_SIZE
+    )
+    children = []
+    for permission, parent in zip(permission_objs, parents):
+        if parent is not None:
+            permission.parent_id = permission_objs[parent]
+            children.append(permission)
+    Permission.objects.bulk_update(children, ['parent_id'], batch_size=DATASET_BATCH_SIZE)
+    rebuild_permission_paths()
+
+    permissions_per_role = min(permissions_per_role, len(permission_objs))
+    RolePermission.objects.bulk_create(
+        [RolePermission(role=role, permission=permission)
+         for role in role_objs
+         for permission in rng.sample(permission_objs, permissions_per_role)],
+        batch_size=DATASET_BATCH_SIZE
+    )
+
+    # 所有用户共用一个哈希，避免生成大量用户时耗在密码哈希上
+    encoded_password = make_password(password)
+    user_count = 0
+    user_role_count = 0
+    for offset in range(0, users, DATASET_BATCH_SIZE):
+        batch = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'{DATASET_PREFIX}_user_{user_start + i}',
+                name=f'Synthetic User {user_start + i}',
+                email=f'{DATASET_PREFIX}_user_{user_start + i}@example.com',
+                phone_number=f'1{user_start + i:010d}',
+                password=encoded_password,
+            )
+            for i in range(offset, min(offset + DATASET_BATCH_SIZE, users))
+        ])
+        user_roles = [UserRole(user=user, role=role)
+                      for user in batch
+                      for role in rng.sample(role_objs, roles_per_user)]
+        UserRole.objects.bulk_create(user_roles)
+        user_count += len(batch)
+        user_role_count += len(user_roles)
+
+    bump_rbac_version()
+    return {
+        'users': user_count,
+        'roles': len(role_objs),
+        'permissions': len(permission_objs),
+        'user_roles': user_role_count,
+        'role_permissions': len(role_objs) * permissions_per_role,
+    }
+
+
+def add_dataset_arguments(parser):
+    """
+    为管理命令添加数据集规模参数，配合 dataset_options() 使用。
+    """
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--roles', type=int, default=50)
+    parser.add_argument('--permissions', type=int, default=500, help='权限总数上限')
+    parser.add_argument('--depth', type=int, default=3, help='权限树层数')
+    parser.add_argument('--fanout', type=int, default=DATASET_TREE_FANOUT, help='权限树每个节点的子节点数')
+    parser.add_argument('--roles-per-user', type=int, default=2)
+    parser.add_argument('--permissions-per-role', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def dataset_options(options):
+    return {key: options[key] for key in ('users', 'roles', 'permissions', 'depth', 'fanout', 'roles_per_user',
+                                          'permissions_per_role', 'seed')}
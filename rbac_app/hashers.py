@@ -0,0 +1,42 @@
+# rbac/hashers.py
+# ==========================
+# Configurable Password Hashers / 可配置参数的密码哈希器
+# ==========================
+# 哈希参数从 settings.RBAC_PASSWORD_HASH_PARAMS 读取，例如：
+#     RBAC_PASSWORD_HASH_PARAMS = {
+#         'argon2': {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1},
+#         'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+#         'pbkdf2_sha256': {'iterations': 600000},
+#     }
+# PASSWORD_HASHERS 的第一项即当前策略。调整参数或更换第一项后，用户下次登录时
+# 旧哈希会被 must_update() 识别出来并按新策略重新哈希（见 rbac_app.backends）。
+# 与 Django 自带哈希器使用相同的算法名，已有哈希无需迁移；同一算法只能在 PASSWORD_HASHERS 中出现一次。
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+
+
+class _ConfigurableParamsMixin:
+    """
+    将哈希器的类属性替换为从配置读取的值，未配置的参数沿用 Django 默认值。
+    """
+    param_names = ()
+
+    def __getattribute__(self, name):
+        if name in type(self).param_names:
+            params = getattr(settings, 'RBAC_PASSWORD_HASH_PARAMS', {}).get(type(self).algorithm, {})
+            if name in params:
+                return params[name]
+        return super().__getattribute__(name)
+
+
+class ConfigurableArgon2PasswordHasher(_ConfigurableParamsMixin, Argon2PasswordHasher):
+    param_names = ('time_cost', 'memory_cost', 'parallelism')
+
+
+class ConfigurableScryptPasswordHasher(_ConfigurableParamsMixin, ScryptPasswordHasher):
+    param_names = ('work_factor', 'block_size', 'parallelism', 'maxmem')
+
+
+class ConfigurablePBKDF2PasswordHasher(_ConfigurableParamsMixin, PBKDF2PasswordHasher):
+    param_names = ('iterations',)
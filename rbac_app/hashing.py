@@ -0,0 +1,28 @@
+# rbac/hashing.py
+# 密码哈希的进程池工作函数。
+# 本模块不导入任何模型，子进程（包括 spawn 启动方式）可以安全导入。
+
+def init_worker():
+    """
+    进程池初始化：spawn 启动的子进程需要先初始化 Django。
+    """
+    import django
+    django.setup()
+
+
+def hash_password(raw_password):
+    from django.contrib.auth.hashers import make_password
+    return make_password(raw_password)
+
+
+def verify_and_rehash(raw_password, encoded):
+    """
+    校验密码；密码正确且存储的哈希不符合当前策略（算法或参数变化）时，同时按当前策略重新计算哈希。
+    只做 CPU 计算，不访问数据库，可以在线程池或进程池中执行。
+    :return: (is_correct, new_encoded)，不需要重新哈希时 new_encoded 为 None
+    """
+    from django.contrib.auth.hashers import make_password, verify_password
+    is_correct, must_update = verify_password(raw_password, encoded)
+    if is_correct and must_update:
+        return True, make_password(raw_password)
+    return is_correct, None
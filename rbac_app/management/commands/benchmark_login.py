@@ -0,0 +1,88 @@
+# rbac/management/commands/benchmark_login.py
+# 测量 PASSWORD_HASHERS 中每个哈希策略的登录吞吐量（每秒登录次数）。
+# 登录耗时几乎全部在密码校验上，这里直接测 verify_and_rehash，不访问数据库。
+# 用法：python manage.py benchmark_login --duration 3 --workers 4
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from rbac_app.hashing import verify_and_rehash
+
+BENCHMARK_PASSWORD = 'benchmark-Passw0rd!'
+
+
+def _path(hasher):
+    return f'{type(hasher).__module__}.{type(hasher).__qualname__}'
+
+
+def _run(encoded, duration, workers):
+    """
+    在 duration 秒内持续校验密码，返回完成的校验次数和实际耗时。
+    """
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        count = 0
+        while time.perf_counter() < deadline:
+            is_correct, _ = verify_and_rehash(BENCHMARK_PASSWORD, encoded)
+            assert is_correct
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        total = sum(f.result() for f in [executor.submit(worker) for _ in range(workers)])
+    return total, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = '测量各密码哈希策略的登录吞吐量（logins/s/core）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=3.0, help='每个策略的测量时间（秒）')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='线程池测量使用的线程数')
+        parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+
+    def handle(self, *args, **options):
+        results = []
+        hashers = get_hashers()
+        for hasher in hashers:
+            # 以当前哈希器为首选策略，使校验不触发重新哈希
+            with override_settings(PASSWORD_HASHERS=[_path(hasher)] + [_path(h) for h in hashers if h is not hasher]):
+                try:
+                    encoded = hasher.encode(BENCHMARK_PASSWORD, hasher.salt())
+                except (ValueError, ImportError) as exc:
+                    # 缺少可选依赖（如 argon2-cffi）时跳过
+                    self.stderr.write(f'{hasher.algorithm}: skipped ({exc})')
+                    continue
+
+                single, single_elapsed = _run(encoded, options['duration'], 1)
+                pooled, pooled_elapsed = _run(encoded, options['duration'], options['workers'])
+
+            results.append({
+                'algorithm': hasher.algorithm,
+                'params': {str(key): str(value) for key, value in hasher.safe_summary(encoded).items()
+                           if str(key) not in ('algorithm', 'salt', 'hash')},
+                'logins_per_sec_per_core': round(single / single_elapsed, 1),
+                'ms_per_login': round(single_elapsed / single * 1000, 2),
+                'workers': options['workers'],
+                'logins_per_sec_pooled': round(pooled / pooled_elapsed, 1),
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"{'algorithm':<16}{'logins/s/core':>15}{'ms/login':>10}{'pooled logins/s':>18}  params")
+        for row in results:
+            params = ', '.join(f'{key}={value}' for key, value in row['params'].items())
+            self.stdout.write(
+                f"{row['algorithm']:<16}{row['logins_per_sec_per_core']:>15}{row['ms_per_login']:>10}"
+                f"{row['logins_per_sec_pooled']:>18}  {params}"
+            )
@@ -0,0 +1,200 @@
+# rbac/management/commands/benchmark_rbac.py
+# 在合成数据集上测量 RBAC 接口：延迟 p50/p99、SQL 查询数、单次请求的内存分配峰值，以 JSON 输出，便于跨提交对比。
+# 默认在事务中生成数据并在结束时回滚；事务内的写入不会触发缓存失效（on_commit 不执行），
+# 结束后统一递增 RBAC 版本号，避免回滚的数据残留在权限缓存中。
+# 用法：python manage.py benchmark_rbac --users 20000 --iterations 200 --output bench.json
+
+import itertools
+import json
+import math
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from rbac_app.dataset import generate_dataset, add_dataset_arguments, dataset_options, DATASET_PREFIX, \
+    DATASET_PASSWORD
+from rbac_app.models import CustomUser, Role, Permission, UserRole
+from rbac_app.utils import bump_rbac_version, build_permission_tree
+
+# 菜单同步时交替新增、删除的节点，使每次同步都有实际写入
+BENCHMARK_MENU_NODE = 'benchmark_menu_node'
+
+
+def percentile(values, percent):
+    """
+    最近秩法百分位数。
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def to_menu(nodes):
+    # build_permission_tree 的结果转为 MenuToPermissionAPIView 接收的菜单树
+    return [{'name': node['name'], 'children': to_menu(node['children'])} for node in nodes]
+
+
+class Command(BaseCommand):
+    help = '测量 RBAC 接口的延迟、查询数和内存分配，输出 JSON'
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--iterations', type=int, default=100, help='每个接口的测量次数')
+        parser.add_argument('--warmup', type=int, default=5, help='每个接口正式测量前的预热次数')
+        parser.add_argument('--memory-iterations', type=int, default=5, help='开启 tracemalloc 测量内存的次数')
+        parser.add_argument('--urlconf', default='rbac_app.urls', help='RBAC 接口所在的 URLconf')
+        parser.add_argument('--no-generate', action='store_true', help='不生成数据，直接使用库中已有数据')
+        parser.add_argument('--keep', action='store_true', help='保留生成的数据（默认回滚）')
+        parser.add_argument('--output', help='结果写入文件，默认输出到标准输出')
+
+    def handle(self, *args, **options):
+        bump_rbac_version()
+        try:
+            # APIClient 以 testserver 作为请求主机，需加入 ALLOWED_HOSTS
+            allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+            with override_settings(ROOT_URLCONF=options['urlconf'], ALLOWED_HOSTS=allowed_hosts), transaction.atomic():
+                summary = None if options['no_generate'] else generate_dataset(**dataset_options(options))
+                endpoints = self.run_benchmarks(options)
+                if not options['keep']:
+                    transaction.set_rollback(True)
+        finally:
+            bump_rbac_version()
+
+        report = json.dumps({
+            'revision': git_revision(),
+            'vendor': connection.vendor,
+            'dataset': summary,
+            'iterations': options['iterations'],
+            'endpoints': endpoints,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(report)
+        else:
+            self.stdout.write(report)
+
+    def scenarios(self):
+        """
+        返回 [(名称, 无参请求函数)]，每次调用发出一个请求并返回响应。
+        """
+        users = list(CustomUser.objects.filter(username__startswith=f'{DATASET_PREFIX}_user_')
+                     .order_by('id').values_list('username', flat=True)[:100])
+        if not users:
+            raise CommandError('No synthetic users found, run without --no-generate first.')
+        role_ids = list(Role.objects.order_by('id').values_list('id', flat=True))
+        rng = random.Random(0)
+
+        client = APIClient()
+        admin_client = APIClient()
+        admin_client.force_authenticate(CustomUser.objects.filter(is_superuser=True).first()
+                                        or CustomUser(username='benchmark', is_superuser=True, is_staff=True))
+
+        login_users = itertools.cycle(users)
+
+        def login():
+            return client.post(reverse('login'), {'username': next(login_users), 'password': DATASET_PASSWORD})
+
+        token = login().data['accessToken']
+
+        def menu():
+            return client.get(reverse('userMenu'), HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        # 每个角色筛选结果的页数，翻页参数在有效范围内随机，覆盖较深的页
+        page_size = 20
+        role_pages = {
+            row['role_id']: math.ceil(row['users'] / page_size)
+            for row in UserRole.objects.filter(user__username__startswith=DATASET_PREFIX, user__is_active=True)
+            .values('role_id').annotate(users=Count('user_id', distinct=True))
+        }
+        list_role_ids = list(role_pages) or role_ids
+
+        def all_users_list():
+            role_id = rng.choice(list_role_ids)
+            return admin_client.get(reverse('all-users-permissions-list'), {
+                'roles[]': [role_id], 'username': DATASET_PREFIX, 'pageSize': page_size,
+                'is_active': 'true', 'startPages': rng.randint(1, role_pages.get(role_id, 1)),
+            })
+
+        rows = Permission.objects.exclude(codename__startswith=Permission.ACTION_CODENAME_PREFIX) \
+            .order_by('path', 'id').values('id', 'name', 'codename', 'parent_id', 'path')
+        menu_tree = to_menu(build_permission_tree(list(rows)))
+        menu_toggle = itertools.cycle([True, False])
+
+        def menu_sync():
+            items = menu_tree + [{'name': BENCHMARK_MENU_NODE}] if next(menu_toggle) else menu_tree
+            return admin_client.post(reverse('menu-to-permission-api'), items, format='json')
+
+        permission_ids = list(Permission.objects.values_list('id', flat=True))
+        role_id = rng.choice(role_ids)
+
+        def role_permissions_update():
+            chosen = rng.sample(permission_ids, min(30, len(permission_ids)))
+            return admin_client.put(reverse('rolepermission-detail', args=[role_id]), {
+                'role_id': role_id, 'permissions': [{'id': pk} for pk in chosen],
+            }, format='json')
+
+        return [
+            ('login', login),
+            ('user_menu', menu),
+            ('all_users_permissions_list', all_users_list),
+            ('menu_to_permission', menu_sync),
+            ('role_permissions_update', role_permissions_update),
+        ]
+
+    def run_benchmarks(self, options):
+        results = {}
+        for name, request in self.scenarios():
+            for _ in range(options['warmup']):
+                self._assert_ok(name, request())
+
+            latencies = []
+            query_counts = []
+            for _ in range(options['iterations']):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = request()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                self._assert_ok(name, response)
+                query_counts.append(len(queries))
+
+            # tracemalloc 本身会显著拖慢执行，单独测量，不计入延迟
+            peaks = []
+            tracemalloc.start()
+            try:
+                for _ in range(options['memory_iterations']):
+                    tracemalloc.reset_peak()
+                    baseline = tracemalloc.get_traced_memory()[0]
+                    self._assert_ok(name, request())
+                    peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            finally:
+                tracemalloc.stop()
+
+            results[name] = {
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'mean_ms': round(statistics.fmean(latencies), 3),
+                'queries_median': statistics.median(query_counts),
+                'queries_max': max(query_counts),
+                'peak_alloc_kb': round(max(peaks) / 1024, 1) if peaks else None,
+            }
+        return results
+
+    def _assert_ok(self, name, response):
+        if response.status_code >= 400:
+            raise CommandError(f'{name} returned {response.status_code}: {getattr(response, "data", "")}')
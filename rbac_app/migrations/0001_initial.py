@@ -0,0 +1,95 @@
+# Generated by Django 5.1.5 on 2026-10-17 22:55
+
+import django.contrib.auth.models
+import django.contrib.auth.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Role',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='角色名称，唯一标识', max_length=50, unique=True)),
+                ('description', models.TextField(blank=True, help_text='角色描述')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='角色创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='角色更新时间')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('username', models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='username')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('email', models.EmailField(blank=True, max_length=254, verbose_name='email address')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('phone_number', models.CharField(blank=True, help_text='用户的电话号码', max_length=15, null=True)),
+                ('address', models.CharField(blank=True, help_text='用户的地址', max_length=255, null=True)),
+                ('name', models.CharField(help_text='用户的姓名', max_length=255, null=True)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'abstract': False,
+            },
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Permission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='权限名称，唯一标识', max_length=50, unique=True)),
+                ('codename', models.CharField(help_text='权限的代码标识，用于程序调用', max_length=100, unique=True)),
+                ('path', models.CharField(db_index=True, default='/', editable=False, help_text='祖先路径（物化路径），如 /1/5/ 表示父级为 5、祖父级为 1，根节点为 /', max_length=255)),
+                ('parent_id', models.ForeignKey(blank=True, default=None, help_text='父级权限，用于权限的分层管理', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='rbac_app.permission')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RolePermission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permission', models.ForeignKey(help_text='关联的权限', on_delete=django.db.models.deletion.CASCADE, related_name='permission_roles', to='rbac_app.permission')),
+                ('role', models.ForeignKey(help_text='关联的角色', on_delete=django.db.models.deletion.CASCADE, related_name='role_permissions', to='rbac_app.role')),
+            ],
+            options={
+                'verbose_name': '角色权限关系',
+                'verbose_name_plural': '角色权限关系',
+                'unique_together': {('role', 'permission')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserRole',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.ForeignKey(help_text='关联的角色', on_delete=django.db.models.deletion.CASCADE, related_name='role_users', to='rbac_app.role')),
+                ('user', models.ForeignKey(help_text='关联的用户', on_delete=django.db.models.deletion.CASCADE, related_name='user_roles', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '用户角色关系',
+                'verbose_name_plural': '用户角色关系',
+                'unique_together': {('user', 'role')},
+            },
+        ),
+    ]
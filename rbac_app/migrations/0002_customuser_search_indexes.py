@@ -0,0 +1,48 @@
+# Generated by Django 5.1.5 on 2026-10-17 22:55
+
+from django.db import migrations, models
+
+# PostgreSQL 专用索引：表达式与 Django 生成的查询保持一致才能命中索引。
+# icontains 生成 UPPER("col"::text) LIKE UPPER('%x%')，由 UPPER(col) 上的 gin_trgm_ops 索引支持；
+# istartswith 生成 UPPER("col"::text) LIKE UPPER('x%')，由 UPPER(col) 上的 text_pattern_ops 索引支持。
+POSTGRES_INDEXES = [
+    ('rbac_user_username_trgm_idx', 'USING gin (UPPER("username"::text) gin_trgm_ops)'),
+    ('rbac_user_name_trgm_idx', 'USING gin (UPPER("name"::text) gin_trgm_ops)'),
+    ('rbac_user_email_upper_prefix_idx', '(UPPER("email"::text) text_pattern_ops)'),
+]
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    table = schema_editor.quote_name(apps.get_model('rbac_app', 'CustomUser')._meta.db_table)
+    for name, definition in POSTGRES_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}')
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('rbac_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['email'], name='rbac_user_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['phone_number'], name='rbac_user_phone_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.5 on 2026-10-17 23:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# 先创建复合唯一约束和索引，再删除被覆盖的 unique_together 和外键单列索引，
+# 迁移过程中始终有可用的索引。
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbac_app', '0002_customuser_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='rolepermission',
+            constraint=models.UniqueConstraint(fields=('role', 'permission'), name='rbac_roleperm_role_perm_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='userrole',
+            constraint=models.UniqueConstraint(fields=('user', 'role'), name='rbac_userrole_user_role_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='rolepermission',
+            index=models.Index(fields=['permission', 'role'], name='rbac_roleperm_perm_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userrole',
+            index=models.Index(fields=['role', 'user'], name='rbac_userrole_role_user_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='rolepermission',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='userrole',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='rolepermission',
+            name='permission',
+            field=models.ForeignKey(db_index=False, help_text='关联的权限', on_delete=django.db.models.deletion.CASCADE, related_name='permission_roles', to='rbac_app.permission'),
+        ),
+        migrations.AlterField(
+            model_name='rolepermission',
+            name='role',
+            field=models.ForeignKey(db_index=False, help_text='关联的角色', on_delete=django.db.models.deletion.CASCADE, related_name='role_permissions', to='rbac_app.role'),
+        ),
+        migrations.AlterField(
+            model_name='userrole',
+            name='role',
+            field=models.ForeignKey(db_index=False, help_text='关联的角色', on_delete=django.db.models.deletion.CASCADE, related_name='role_users', to='rbac_app.role'),
+        ),
+        migrations.AlterField(
+            model_name='userrole',
+            name='user',
+            field=models.ForeignKey(db_index=False, help_text='关联的用户', on_delete=django.db.models.deletion.CASCADE, related_name='user_roles', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
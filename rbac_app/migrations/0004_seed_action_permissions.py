@@ -0,0 +1,45 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:12
+
+from django.db import migrations
+
+# 管理接口的操作权限（RbacPermission 校验的 codename，与视图上的 rbac_permissions 对应）。
+# name 与 codename 相同，带 rbac: 前缀，菜单同步不会改动这些权限。
+ACTION_PERMISSIONS = {
+    'user': ['view', 'add', 'change', 'delete', 'export', 'import'],
+    'role': ['view', 'add', 'change', 'delete'],
+    'permission': ['view', 'add', 'change', 'delete', 'sync'],
+    'user_role': ['view', 'add', 'change', 'delete'],
+    'role_permission': ['view', 'add', 'change', 'delete'],
+}
+
+
+def action_codenames():
+    return [
+        f'rbac:{resource}:{operation}'
+        for resource, operations in ACTION_PERMISSIONS.items()
+        for operation in operations
+    ]
+
+
+def seed_action_permissions(apps, schema_editor):
+    Permission = apps.get_model('rbac_app', 'Permission')
+    Permission.objects.bulk_create(
+        [Permission(name=codename, codename=codename, path='/') for codename in action_codenames()],
+        ignore_conflicts=True,
+    )
+
+
+def remove_action_permissions(apps, schema_editor):
+    Permission = apps.get_model('rbac_app', 'Permission')
+    Permission.objects.filter(codename__in=action_codenames()).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbac_app', '0003_rbac_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_action_permissions, remove_action_permissions),
+    ]
@@ -6,6 +6,8 @@
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Concat, Substr
 
 class CustomUser(AbstractUser):
     """
@@ -16,6 +18,30 @@ class CustomUser(AbstractUser):
     address = models.CharField(max_length=255, blank=True, null=True, help_text="用户的地址")
     name = models.CharField(max_length=255, blank=False, null=True, help_text="用户的姓名")
 
+    # 影响访问令牌有效性的账号状态，变化时递增 RBAC 版本号（见 signals）
+    ACCOUNT_FLAGS = ('is_active', 'is_superuser')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # 记录加载时的账号状态，保存时据此判断是否变化（延迟加载的字段不记录）
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_account_flags = instance.loaded_account_flags()
+        return instance
+
+    def loaded_account_flags(self):
+        return {field: self.__dict__[field] for field in self.ACCOUNT_FLAGS if field in self.__dict__}
+
+    class Meta(AbstractUser.Meta):
+        # 与用户搜索策略（AllUsersPermissionsViewSet.search_lookups）对应的索引。
+        # email 的普通索引用于精确查找（如邮箱验证码登录）；
+        # varchar_pattern_ops 仅在 PostgreSQL 上生效，使前缀匹配（LIKE 'x%'）可以走索引。
+        # username、name 的三元组（trigram）索引和 email 的不区分大小写前缀索引只适用于 PostgreSQL，
+        # 在迁移 0002 中按数据库类型创建。
+        indexes = [
+            models.Index(fields=['email'], name='rbac_user_email_idx'),
+            models.Index(fields=['phone_number'], name='rbac_user_phone_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
 class Role(models.Model):
     """
     角色模型：用于定义系统中的不同角色。
@@ -37,6 +63,10 @@ class Permission(models.Model):
     """
     权限模型：用于定义系统中的操作权限。
     """
+    # 接口操作权限（RbacPermission 校验的 codename）的保留前缀，如 rbac:role:view。
+    # 这类权限由迁移写入，不属于前端菜单，菜单同步不会新增、移动或删除它们。
+    ACTION_CODENAME_PREFIX = 'rbac:'
+
     name = models.CharField(max_length=50, unique=True, help_text="权限名称，唯一标识")
     codename = models.CharField(max_length=100, unique=True, help_text="权限的代码标识，用于程序调用")
     parent_id = models.ForeignKey(
@@ -48,10 +78,83 @@ class Permission(models.Model):
         related_name='children',
         help_text="父级权限，用于权限的分层管理"
     )
+    path = models.CharField(
+        max_length=255,
+        default='/',
+        db_index=True,
+        editable=False,
+        help_text="祖先路径（物化路径），如 /1/5/ 表示父级为 5、祖父级为 1，根节点为 /"
+    )
 
     def __str__(self):
         return self.name
 
+    @property
+    def subtree_prefix(self):
+        """
+        子孙节点 path 的公共前缀。
+        """
+        return f'{self.path}{self.pk}/'
+
+    def save(self, *args, **kwargs):
+        """
+        保存时根据父级重新计算 path；父级变化时用一条 UPDATE 同步所有子孙节点的 path。
+        """
+        parent = self.parent_id
+        new_path = parent.subtree_prefix if parent is not None else '/'
+
+        if self.pk is not None and f'/{self.pk}/' in new_path:
+            raise ValueError("不能将权限的父级设置为其自身或其子孙节点")
+
+        old_prefix = self.subtree_prefix if self.pk is not None else None
+        self.path = new_path
+        super().save(*args, **kwargs)
+
+        if old_prefix is not None and old_prefix != self.subtree_prefix:
+            self._move_descendants(old_prefix, self.subtree_prefix)
+
+    def delete(self, *args, **kwargs):
+        """
+        删除后子节点的父级被置空（SET_NULL），同步把子孙节点的 path 提升到根。
+        """
+        old_prefix = self.subtree_prefix
+        result = super().delete(*args, **kwargs)
+        self._move_descendants(old_prefix, '/')
+        return result
+
+    @classmethod
+    def _move_descendants(cls, old_prefix, new_prefix):
+        cls.objects.filter(path__startswith=old_prefix).update(
+            path=Concat(Value(new_prefix), Substr('path', len(old_prefix) + 1), output_field=models.CharField())
+        )
+
+    def get_ancestor_ids(self):
+        """
+        祖先节点 ID 列表（由根到父级），直接从 path 解析，无需查询。
+        """
+        return [int(pk) for pk in self.path.strip('/').split('/') if pk]
+
+    def get_ancestors(self):
+        """
+        祖先节点查询集（主键查询）。
+        """
+        return Permission.objects.filter(pk__in=self.get_ancestor_ids())
+
+    def get_descendants(self, include_self=False):
+        """
+        子孙节点查询集，基于 path 前缀的索引查询。
+        """
+        query = Q(path__startswith=self.subtree_prefix)
+        if include_self:
+            query |= Q(pk=self.pk)
+        return Permission.objects.filter(query)
+
+    def is_ancestor_of(self, other):
+        """
+        判断当前节点是否为 other 的祖先节点，无需查询。
+        """
+        return f'/{self.pk}/' in other.path
+
 # ==========================
 # Relationship Models / 关系模型
 # ==========================
@@ -61,21 +164,31 @@ class UserRole(models.Model):
     """
     用户与角色的关系表：用于表示用户拥有哪些角色。
     """
+    # 外键的单列索引由下面以该字段开头的复合索引覆盖，不再单独创建
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
         related_name="user_roles",
+        db_index=False,
         help_text="关联的用户"
     )
     role = models.ForeignKey(
         Role,
         on_delete=models.CASCADE,
         related_name="role_users",
+        db_index=False,
         help_text="关联的角色"
     )
 
     class Meta:
-        unique_together = ('user', 'role')
+        constraints = [
+            # 用户 -> 角色 ID：登录、权限缓存按 user 过滤，只读索引即可取到 role_id
+            models.UniqueConstraint(fields=['user', 'role'], name='rbac_userrole_user_role_uniq'),
+        ]
+        indexes = [
+            # 角色 -> 用户：角色用户数、按角色筛选用户
+            models.Index(fields=['role', 'user'], name='rbac_userrole_role_user_idx'),
+        ]
         verbose_name = "用户角色关系"
         verbose_name_plural = "用户角色关系"
 
@@ -83,20 +196,30 @@ class RolePermission(models.Model):
     """
     角色与权限的关系表：用于表示角色拥有哪些权限。
     """
+    # 外键的单列索引由下面以该字段开头的复合索引覆盖，不再单独创建
     role = models.ForeignKey(
         Role,
         on_delete=models.CASCADE,
         related_name="role_permissions",
+        db_index=False,
         help_text="关联的角色"
     )
     permission = models.ForeignKey(
         Permission,
         on_delete=models.CASCADE,
         related_name="permission_roles",
+        db_index=False,
         help_text="关联的权限"
     )
 
     class Meta:
-        unique_together = ('role', 'permission')
+        constraints = [
+            # 角色 -> 权限 ID（role__in）以及 (role, permission) 存在性检查
+            models.UniqueConstraint(fields=['role', 'permission'], name='rbac_roleperm_role_perm_uniq'),
+        ]
+        indexes = [
+            # 权限 -> 角色：删除权限时的级联、按权限查角色
+            models.Index(fields=['permission', 'role'], name='rbac_roleperm_perm_role_idx'),
+        ]
         verbose_name = "角色权限关系"
         verbose_name_plural = "角色权限关系"
@@ -0,0 +1,98 @@
+# rbac/permissions.py
+# ==========================
+# RBAC Permission Class / 基于角色的 DRF 权限类
+# ==========================
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+from .models import Permission
+from .utils import get_user_codenames, aget_user_codenames
+
+
+class RbacPermission(BasePermission):
+    """
+    根据视图声明的 codename 校验用户权限。
+
+    在视图上通过 rbac_permissions 声明每个动作需要的 codename，
+    ViewSet 以 action 为键（list、retrieve、create 等），APIView 以小写的请求方法为键（get、post 等）；
+    值可以是单个 codename，也可以是多个 codename 的列表（需全部满足）。
+    未声明的动作只要求用户已登录，超级用户不受限制。
+    只有 settings.RBAC_ENFORCE_PERMISSIONS 为 True 时才校验，否则放行所有请求（与未接入前的行为一致），
+    需先为角色分配好 rbac: 前缀的操作权限（迁移 0004 写入）再开启。
+
+    用户的 codename 集合在同一请求内只加载一次（来自权限缓存，未命中时查询数据库），
+    因此每次校验只是一次集合判断。异步视图（AsyncAPIView）调用 ahas_permission，使用异步缓存和异步 ORM。
+
+    示例：
+        class RoleViewSet(SearchableListModelMixin):
+            permission_classes = [RbacPermission]
+            rbac_permissions = {
+                'list': 'rbac:role:view',
+                'create': 'rbac:role:add',
+                'destroy': ['rbac:role:view', 'rbac:role:delete'],
+            }
+    """
+
+    def has_permission(self, request, view):
+        if not getattr(settings, 'RBAC_ENFORCE_PERMISSIONS', False):
+            return True
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+
+        required = self.get_required_codenames(request, view)
+        if not required or user.is_superuser:
+            return True
+
+        return required <= get_user_codenames(request)
+
+    async def ahas_permission(self, request, view):
+        if not getattr(settings, 'RBAC_ENFORCE_PERMISSIONS', False):
+            return True
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+
+        required = self.get_required_codenames(request, view)
+        if not required or user.is_superuser:
+            return True
+
+        return required <= await aget_user_codenames(request)
+
+    def get_required_codenames(self, request, view):
+        """
+        获取当前动作需要的 codename 集合。
+        """
+        rbac_permissions = getattr(view, 'rbac_permissions', None) or {}
+        key = getattr(view, 'action', None) or request.method.lower()
+        required = rbac_permissions.get(key)
+        if not required:
+            return frozenset()
+        if isinstance(required, str):
+            return frozenset([required])
+        return frozenset(required)
+
+
+def action_codename(resource, operation):
+    """
+    接口操作权限的 codename：rbac:<resource>:<operation>。
+    """
+    return f'{Permission.ACTION_CODENAME_PREFIX}{resource}:{operation}'
+
+
+def crud_codenames(resource, **extra):
+    """
+    生成 ModelViewSet 标准动作的 codename 声明：查看 rbac:<resource>:view、新增 :add、修改 :change、删除 :delete。
+    :param extra: 自定义动作对应的操作，如 export='export' 表示 export 动作需要 rbac:<resource>:export
+    """
+    actions = {
+        'list': 'view',
+        'retrieve': 'view',
+        'create': 'add',
+        'update': 'change',
+        'partial_update': 'change',
+        'destroy': 'delete',
+        **extra,
+    }
+    return {action: action_codename(resource, operation) for action, operation in actions.items()}
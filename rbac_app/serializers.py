@@ -3,8 +3,10 @@
 
 from rest_framework import serializers
 from .models import Role, Permission, UserRole, RolePermission, CustomUser
+from .utils import set_user_roles
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 
@@ -41,15 +43,38 @@ class CustomUserSerializer(serializers.ModelSerializer):
 
 # 角色 序列化器
 class RoleSerializer(serializers.ModelSerializer):
+    # 由 RoleViewSet.get_queryset 注解，新建的角色没有注解时为 0
+    permission_count = serializers.IntegerField(read_only=True, default=0)
+    user_count = serializers.IntegerField(read_only=True, default=0)
+    # 仅在 context 中 with_permission_ids 为真时返回
+    permission_ids = serializers.SerializerMethodField()
+
     class Meta:
         model = Role
         fields = '__all__'
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.context.get('with_permission_ids'):
+            fields.pop('permission_ids')
+        return fields
+
+    def get_permission_ids(self, obj):
+        return sorted(getattr(obj, 'permission_ids', None) or [])
+
 # 权限  菜单  序列化器
 class PermissionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Permission
         fields = '__all__'
+        read_only_fields = ['path']
+
+    def validate_parent_id(self, value):
+        # 防止形成环：父级不能是自身或自身的子孙节点
+        if value is not None and self.instance is not None:
+            if value.pk == self.instance.pk or self.instance.is_ancestor_of(value):
+                raise serializers.ValidationError("不能将权限的父级设置为其自身或其子孙节点")
+        return value
 
 # 用户角色关系 序列化器
 class UserRoleSerializer(serializers.ModelSerializer):
@@ -65,9 +90,9 @@ class RolePermissionSerializer(serializers.ModelSerializer):
 
 # User serializer with role selection
 class UserSerializer(serializers.ModelSerializer):
-    roles = serializers.PrimaryKeyRelatedField(
-        queryset=Role.objects.all(),
-        many=True,
+    # 角色 ID 列表，在 validate_roles 中一次查询校验，避免逐个主键查询
+    roles = serializers.ListField(
+        child=serializers.IntegerField(),
         write_only=True
     )
 
@@ -79,6 +104,15 @@ class UserSerializer(serializers.ModelSerializer):
             'password': {'write_only': True}
         }
 
+    def validate_roles(self, value):
+        role_ids = set(value)
+        existing = set(Role.objects.filter(id__in=role_ids).values_list('id', flat=True))
+        missing = role_ids - existing
+        if missing:
+            raise serializers.ValidationError(f'Invalid role id(s): {sorted(missing)}')
+        return list(role_ids)
+
+    @transaction.atomic
     def create(self, validated_data):
         roles = validated_data.pop('roles', [])
         user = CustomUser(**validated_data)
@@ -86,10 +120,10 @@ class UserSerializer(serializers.ModelSerializer):
         user.save()
 
         # Assign roles to user
-        for role in roles:
-            UserRole.objects.create(user=user, role=role)
+        set_user_roles(user, roles)
         return user
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         roles = validated_data.pop('roles', [])
         instance.username = validated_data.get('username', instance.username)
@@ -100,7 +134,5 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
 
         # Update roles
-        UserRole.objects.filter(user=instance).delete()
-        for role in roles:
-            UserRole.objects.create(user=instance, role=role)
+        set_user_roles(instance, roles)
         return instance
\ No newline at end of file
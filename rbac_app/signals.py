@@ -0,0 +1,45 @@
+# rbac/signals.py
+# 监听角色、权限及其关系表的写入，递增 RBAC 版本号使权限缓存失效。
+# 注意：bulk_create / bulk_update / QuerySet.update 不会触发信号，
+# 使用这些批量写入的代码需要自行调用 bump_rbac_version()。
+# QuerySet.delete() 会逐行触发 post_delete，bump_rbac_version() 在同一事务中只登记一次递增。
+# 用户的 is_active / is_superuser 变化或用户被删除时同样递增版本号，
+# 携带 RBAC 声明的令牌随之重新校验账号状态（见 RbacJWTAuthentication）；
+# 通过 QuerySet.update() 修改这两个字段时需要自行调用 bump_rbac_version()。
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import CustomUser, Role, Permission, UserRole, RolePermission
+from .utils import bump_rbac_version
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_rbac_cache(sender, **kwargs):
+    bump_rbac_version()
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_tokens_on_account_change(sender, instance, created, update_fields=None, **kwargs):
+    loaded = getattr(instance, '_loaded_account_flags', None)
+    current = instance.loaded_account_flags()
+    instance._loaded_account_flags = current
+    if created:
+        return
+    if update_fields is not None and not set(update_fields) & set(CustomUser.ACCOUNT_FLAGS):
+        return
+    # 不是从数据库加载的实例无法比对，按已变化处理
+    if loaded is None or any(loaded.get(field, value) != value for field, value in current.items()):
+        bump_rbac_version()
+
+
+@receiver(post_delete, sender=CustomUser)
+def invalidate_tokens_on_account_delete(sender, **kwargs):
+    bump_rbac_version()
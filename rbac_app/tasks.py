@@ -0,0 +1,31 @@
+# rbac/tasks.py
+import os
+
+from celery import shared_task
+
+from .user_import import import_users, read_rows, set_import_progress
+
+
+@shared_task
+def import_users_task(import_id, file_path, file_format):
+    """
+    异步导入用户：逐块处理上传的文件，并把进度写入缓存，完成后删除临时文件。
+    """
+    set_import_progress(import_id, 'running')
+    try:
+        with open(file_path, 'rb') as f:
+            report = import_users(
+                read_rows(f, file_format),
+                # prefork worker 是守护进程，不能创建进程池
+                hash_in_threads=True,
+                progress_callback=lambda current: set_import_progress(import_id, 'running', current)
+            )
+    except Exception as e:
+        set_import_progress(import_id, 'failed', {'detail': str(e)})
+        raise
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    set_import_progress(import_id, 'completed', report)
+    return report
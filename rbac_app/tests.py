@@ -1,3 +1,852 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import aauthenticate, authenticate
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import RbacJWTAuthentication
+from .models import CustomUser, Role, Permission, UserRole, RolePermission
+from .permissions import RbacPermission
+from .user_export import EXPORT_FIELDS
+from . import views
+from .utils import _incr_rbac_version, add_rbac_claims, bump_rbac_version, get_effective_permissions, \
+    get_rbac_version, get_user_codenames, replace_role_permissions, set_user_roles, sync_menu_permissions, \
+    MenuCycleError, MenuSyncError
+from .views import AllUsersPermissionsViewSet, RoleViewSet
+
+
+@override_settings(ROOT_URLCONF='rbac_app.urls')
+class AllUsersPermissionsQueryCountTests(APITestCase):
+    """
+    用户管理列表的查询次数不应随分页大小增长（避免 N+1 角色查询）。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        roles = [Role.objects.create(name=f'role_{i}') for i in range(3)]
+        for i in range(30):
+            user = CustomUser.objects.create(username=f'user_{i}', name=f'User {i}')
+            for role in roles[:i % 3 + 1]:
+                UserRole.objects.create(user=user, role=role)
+        cls.admin = CustomUser.objects.create(username='admin', name='Admin', is_superuser=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def test_paginated_query_count_is_constant(self):
+        # 分页计数 + 当前页用户 + 批量角色
+        with self.assertNumQueries(3):
+            small = self.client.get('/all-users-permissions/', {'pageSize': 5})
+        with self.assertNumQueries(3):
+            large = self.client.get('/all-users-permissions/', {'pageSize': 30})
+
+        self.assertEqual(len(small.data['results']), 5)
+        self.assertEqual(len(large.data['results']), 30)
+
+    def test_unpaginated_query_count_is_constant(self):
+        with mock.patch.object(AllUsersPermissionsViewSet, 'pagination_class', None):
+            # 用户 + 批量角色
+            with self.assertNumQueries(2):
+                response = self.client.get('/all-users-permissions/')
+
+        self.assertEqual(len(response.data), 31)
+
+    def test_roles_are_attached_to_each_user(self):
+        response = self.client.get('/all-users-permissions/', {'pageSize': 30})
+
+        for user_data in response.data['results']:
+            expected = list(
+                UserRole.objects.filter(user_id=user_data['id']).values_list('role__name', flat=True)
+            )
+            self.assertCountEqual([role['name'] for role in user_data['roles']], expected)
+
+
+@override_settings(ROOT_URLCONF='rbac_app.urls')
+class UserManagementCursorPaginationTests(APITestCase):
+    """
+    用户管理列表默认使用页码分页，传入 paginate=cursor 时使用游标分页：
+    不统计总数，逐页翻完不重复、不遗漏。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', name='Admin', is_superuser=True)
+        CustomUser.objects.bulk_create([CustomUser(username=f'user_{i}', name=f'User {i}') for i in range(24)])
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get('/all-users/', {'pageSize': 10, 'startPages': 3})
+
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_cursor_pages_cover_all_users_without_count(self):
+        ids = []
+        url, params = '/all-users/', {'pageSize': 10, 'paginate': 'cursor'}
+        while url:
+            # 只查询当前页（多取一行判断是否有下一页），不执行 COUNT(*)
+            with self.assertNumQueries(1):
+                response = self.client.get(url, params)
+            self.assertNotIn('count', response.data)
+            ids.extend(user['id'] for user in response.data['results'])
+            url, params = response.data['next'], None
+
+        self.assertEqual(ids, sorted(CustomUser.objects.values_list('id', flat=True), reverse=True))
+
+    def test_exact_count_is_opt_in(self):
+        response = self.client.get('/all-users/', {'pageSize': 10, 'paginate': 'cursor', 'withCount': 'exact'})
+
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+
+@override_settings(ROOT_URLCONF='rbac_app.urls')
+class UserExportTests(APITestCase):
+    """
+    WSGI 下以同步迭代器流式导出，ASGI 下以异步迭代器流式导出（避免整体读入内存）。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name='editor')
+        cls.admin = CustomUser.objects.create(username='admin', name='Admin', is_superuser=True)
+        for i in range(5):
+            user = CustomUser.objects.create(username=f'user_{i}', name=f'User {i}')
+            if i % 2:
+                UserRole.objects.create(user=user, role=role)
+
+    def test_wsgi_export_streams_sync_iterator(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/all-users-permissions/export/', {'exportFormat': 'ndjson'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({row['username'] for row in rows if row['roles']}, {'user_1', 'user_3'})
+
+    async def test_asgi_export_streams_async_iterator(self):
+        token = AccessToken.for_user(self.admin)
+        response = await AsyncClient().get('/all-users-permissions/export/',
+                                          headers={'Authorization': f'Bearer {token}'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual(lines[0].decode().strip().split(','), EXPORT_FIELDS + ['roles'])
+        self.assertEqual(len(lines), 7)
+
+
+@override_settings(ROOT_URLCONF='rbac_app.urls', RBAC_ENFORCE_PERMISSIONS=True)
+class RbacPermissionTests(APITestCase):
+    """
+    RbacPermission 按 rbac_permissions 声明的 codename 放行或拒绝，超级用户不受限制。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = role = Role.objects.create(name='viewer')
+        RolePermission.objects.create(role=role, permission=Permission.objects.get(codename='rbac:role:view'))
+        cls.viewer = CustomUser.objects.create(username='viewer', name='Viewer')
+        UserRole.objects.create(user=cls.viewer, role=role)
+        cls.admin = CustomUser.objects.create(username='admin', name='Admin', is_superuser=True)
+
+    def setUp(self):
+        # TestCase 的事务不会提交，版本号不递增，清空缓存避免读到其它用例的权限
+        cache.clear()
+
+    def request_as(self, user, method, action):
+        data = {'name': 'new role'} if method == 'post' else None
+        request = getattr(APIRequestFactory(), method)('/roles/', data, format='json')
+        force_authenticate(request, user=user)
+        view = RoleViewSet.as_view({method: action})
+        return view(request)
+
+    def drf_request(self, user, method):
+        request = Request(getattr(APIRequestFactory(), method)('/roles/'))
+        request.user = user
+        return request
+
+    def ahas_permission(self, user, method, action):
+        request = self.drf_request(user, method)
+        return async_to_sync(RbacPermission().ahas_permission)(request, RoleViewSet(action=action))
+
+    def test_allows_declared_codename(self):
+        self.assertEqual(self.request_as(self.viewer, 'get', 'list').status_code, 200)
+        self.assertTrue(self.ahas_permission(self.viewer, 'get', 'list'))
+
+    def test_denies_missing_codename(self):
+        self.assertEqual(self.request_as(self.viewer, 'post', 'create').status_code, 403)
+        self.assertFalse(self.ahas_permission(self.viewer, 'post', 'create'))
+
+    def test_superuser_bypasses_codenames(self):
+        response = self.request_as(self.admin, 'post', 'create')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(self.ahas_permission(self.admin, 'post', 'create'))
+
+    def test_denies_anonymous(self):
+        self.assertIn(self.request_as(None, 'get', 'list').status_code, (401, 403))
+
+    def test_codenames_loaded_once_per_request(self):
+        view = RoleViewSet(action='list')
+        request = self.drf_request(self.viewer, 'get')
+        permission = RbacPermission()
+        self.assertTrue(permission.has_permission(request, view))
+        with self.assertNumQueries(0):
+            self.assertTrue(permission.has_permission(request, view))
+            self.assertTrue(async_to_sync(permission.ahas_permission)(request, view))
+
+    @override_settings(RBAC_ENFORCE_PERMISSIONS=False)
+    def test_disabled_enforcement_allows_all(self):
+        self.assertEqual(self.request_as(None, 'get', 'list').status_code, 200)
+        self.assertTrue(self.ahas_permission(self.viewer, 'post', 'create'))
+
+    def test_declared_codenames_are_seeded(self):
+        declared = set()
+        for view in vars(views).values():
+            for required in (getattr(view, 'rbac_permissions', None) or {}).values():
+                declared.update([required] if isinstance(required, str) else required)
+
+        self.assertTrue(declared)
+        self.assertTrue(all(codename.startswith(Permission.ACTION_CODENAME_PREFIX) for codename in declared))
+        seeded = set(Permission.objects.filter(codename__in=declared).values_list('codename', flat=True))
+        self.assertEqual(seeded, declared)
+
+    def test_menu_sync_keeps_action_permissions_and_grants(self):
+        sync_menu_permissions([{'name': 'system', 'children': [{'name': 'role'}]}])
+
+        self.assertTrue(RolePermission.objects.filter(role=self.role, permission__codename='rbac:role:view').exists())
+        self.assertEqual(self.request_as(self.viewer, 'get', 'list').status_code, 200)
+        with self.assertRaises(MenuSyncError):
+            sync_menu_permissions([{'name': 'rbac:role:view'}])
+
+    def test_action_permissions_are_not_menu_items(self):
+        menu = get_effective_permissions(self.viewer)['menu']
+
+        self.assertEqual(menu, [])
+        self.assertIn('rbac:role:view', get_user_codenames(self.drf_request(self.viewer, 'get')))
+
+
+@override_settings(ROOT_URLCONF='rbac_app.urls')
+class GrantSubtreeTests(APITestCase):
+    """
+    grant_subtree 只插入角色尚未拥有的权限，返回实际插入数，没有新增时不递增版本号。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name='editor')
+        cls.root = Permission.objects.create(name='系统管理', codename='system')
+        cls.child = Permission.objects.create(name='用户管理', codename='system:user', parent_id=cls.root)
+        Permission.objects.create(name='新增用户', codename='system:user:add', parent_id=cls.child)
+        cls.admin = CustomUser.objects.create(username='admin', name='Admin', is_superuser=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def grant(self):
+        return self.client.post('/role-permissions/grant-subtree/', {'role': self.role.pk, 'permission': self.root.pk},
+                                format='json')
+
+    def test_counts_only_new_rows(self):
+        RolePermission.objects.create(role=self.role, permission=self.child)
+
+        with mock.patch('rbac_app.views.bump_rbac_version') as bump:
+            response = self.grant()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 2)
+        bump.assert_called_once()
+        self.assertEqual(RolePermission.objects.filter(role=self.role).count(), 3)
+
+    def test_regrant_inserts_nothing_and_keeps_version(self):
+        self.grant()
+
+        with mock.patch('rbac_app.views.bump_rbac_version') as bump:
+            response = self.grant()
+        self.assertEqual(response.data['count'], 0)
+        bump.assert_not_called()
+
+
+class RbacTokenVersionTests(APITestCase):
+    """
+    RBAC 版本号变化后，只有角色发生变化的用户的令牌需要刷新。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name='viewer')
+        cls.other_role = Role.objects.create(name='editor')
+        cls.user = CustomUser.objects.create(username='viewer', name='Viewer')
+        UserRole.objects.create(user=cls.user, role=cls.role)
+
+    def setUp(self):
+        cache.clear()
+        access = AccessToken.for_user(self.user)
+        add_rbac_claims(access, self.user, [self.role.pk], get_rbac_version())
+        self.token = AccessToken(str(access))
+        self.authentication = RbacJWTAuthentication()
+
+    def test_current_version_skips_database(self):
+        with self.assertNumQueries(0):
+            user = self.authentication.get_user(self.token)
+        self.assertEqual(user.role_ids, [self.role.pk])
+
+    def test_unrelated_write_keeps_token_valid(self):
+        RolePermission.objects.create(role=self.role, permission=Permission.objects.create(name='p', codename='p'))
+        _incr_rbac_version()
+
+        self.assertEqual(self.authentication.get_user(self.token).role_ids, [self.role.pk])
+        self.assertEqual(async_to_sync(self.authentication.aget_user)(self.token).role_ids, [self.role.pk])
+        # 角色 ID 按版本缓存，同一版本内不再查询数据库
+        with self.assertNumQueries(0):
+            self.authentication.get_user(self.token)
+
+    def test_changed_roles_require_refresh(self):
+        UserRole.objects.create(user=self.user, role=self.other_role)
+        _incr_rbac_version()
+
+        with self.assertRaises(InvalidToken):
+            self.authentication.get_user(self.token)
+        with self.assertRaises(InvalidToken):
+            async_to_sync(self.authentication.aget_user)(self.token)
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        _incr_rbac_version()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(self.token)
+        with self.assertRaises(AuthenticationFailed):
+            async_to_sync(self.authentication.aget_user)(self.token)
+
+    def test_superuser_demotion_requires_refresh(self):
+        access = AccessToken.for_user(self.user)
+        self.user.is_superuser = True
+        add_rbac_claims(access, self.user, [self.role.pk], get_rbac_version())
+        token = AccessToken(str(access))
+        CustomUser.objects.filter(pk=self.user.pk).update(is_superuser=False)
+        _incr_rbac_version()
+
+        with self.assertRaises(InvalidToken):
+            self.authentication.get_user(token)
+        with self.assertRaises(InvalidToken):
+            async_to_sync(self.authentication.aget_user)(token)
+
+    def test_account_flag_changes_bump_version(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        with mock.patch('rbac_app.signals.bump_rbac_version') as bump:
+            user.name = 'Renamed'
+            user.save()
+            user.save(update_fields=['last_login'])
+            bump.assert_not_called()
+
+            user.is_active = False
+            user.save()
+            bump.assert_called_once()
+
+            bump.reset_mock()
+            user.is_superuser = True
+            user.save(update_fields=['is_superuser'])
+            bump.assert_called_once()
+
+
+def menu_tree(count, prefix='menu'):
+    # count 个节点：每个一级菜单下挂 4 个子菜单
+    tree = []
+    for i in range(0, count, 5):
+        children = [{'name': f'{prefix}_{j}'} for j in range(i + 1, min(i + 5, count))]
+        tree.append({'name': f'{prefix}_{i}', 'children': children})
+    return tree
+
+
+@override_settings(ROOT_URLCONF='rbac_app.urls')
+class MenuPermissionSyncTests(APITestCase):
+    """
+    菜单同步按差异批量写入：移动、删除、循环引用，以及查询次数与菜单规模无关。
+    """
+
+    def setUp(self):
+        sync_menu_permissions([
+            {'name': 'system', 'children': [
+                {'name': 'user', 'children': [{'name': 'user_add'}]},
+                {'name': 'role'},
+            ]},
+            {'name': 'log'},
+        ])
+        self.permissions = {perm.name: perm for perm in Permission.objects.all()}
+
+    def test_move_updates_parent_and_descendant_paths(self):
+        summary = sync_menu_permissions([
+            {'name': 'system', 'children': [{'name': 'role'}]},
+            {'name': 'log', 'children': [
+                {'name': 'user', 'children': [{'name': 'user_add'}]},
+            ]},
+        ])
+
+        self.assertEqual(summary, {'created': 0, 'updated': 2, 'deleted': 0})
+        user = Permission.objects.get(name='user')
+        self.assertEqual(user.parent_id, self.permissions['log'])
+        self.assertEqual(user.path, f"/{self.permissions['log'].pk}/")
+        self.assertEqual(Permission.objects.get(name='user_add').path, f"{user.subtree_prefix}")
+
+    def test_delete_removes_stale_permissions_and_grants(self):
+        role = Role.objects.create(name='editor')
+        RolePermission.objects.create(role=role, permission=self.permissions['role'])
+
+        summary = sync_menu_permissions([
+            {'name': 'system', 'children': [
+                {'name': 'user', 'children': [{'name': 'user_add'}]},
+            ]},
+            {'name': 'log'},
+        ])
+
+        self.assertEqual(summary, {'created': 0, 'updated': 0, 'deleted': 1})
+        self.assertFalse(Permission.objects.filter(name='role').exists())
+        self.assertFalse(RolePermission.objects.filter(role=role).exists())
+
+    def test_cycle_is_rejected_without_partial_writes(self):
+        admin = CustomUser.objects.create(username='admin', name='Admin', is_superuser=True)
+        self.client.force_authenticate(admin)
+
+        # 同名节点以最后出现的位置为准：system -> user -> system 形成循环
+        response = self.client.post('/menu-to-permission/', [
+            {'name': 'system', 'children': [
+                {'name': 'user', 'children': [{'name': 'system'}, {'name': 'audit'}]},
+            ]},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual({perm.name: perm.path for perm in Permission.objects.all()},
+                         {name: perm.path for name, perm in self.permissions.items()})
+        with self.assertRaises(MenuCycleError):
+            sync_menu_permissions([{'name': 'a', 'children': [{'name': 'b', 'children': [{'name': 'a'}]}]}])
+
+    def test_unexpected_value_error_is_not_reported_as_bad_menu(self):
+        admin = CustomUser.objects.create(username='admin', name='Admin', is_superuser=True)
+        self.client.force_authenticate(admin)
+
+        with mock.patch('rbac_app.views.sync_menu_permissions', side_effect=ValueError('bug')):
+            with self.assertRaises(ValueError):
+                self.client.post('/menu-to-permission/', [{'name': 'system'}], format='json')
+
+    def test_new_nodes_without_returned_primary_keys(self):
+        # 模拟不支持 RETURNING 的数据库：bulk_create 后对象没有主键
+        bulk_create = Permission.objects.bulk_create
+
+        def bulk_create_without_pks(objs, *args, **kwargs):
+            created = bulk_create(objs, *args, **kwargs)
+            for obj in objs:
+                obj.pk = None
+            return created
+
+        with mock.patch.object(Permission.objects, 'bulk_create', side_effect=bulk_create_without_pks):
+            summary = sync_menu_permissions([
+                {'name': 'system', 'children': [
+                    {'name': 'user', 'children': [{'name': 'user_add'}, {'name': 'user_import'}]},
+                ]},
+                {'name': 'log', 'children': [{'name': 'audit'}]},
+            ])
+
+        self.assertEqual(summary, {'created': 2, 'updated': 0, 'deleted': 1})
+        user = Permission.objects.get(name='user')
+        self.assertEqual(Permission.objects.get(name='user_import').path, user.subtree_prefix)
+        audit = Permission.objects.get(name='audit')
+        self.assertEqual(audit.parent_id, self.permissions['log'])
+        self.assertEqual(audit.path, self.permissions['log'].subtree_prefix)
+
+    def test_unchanged_menu_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            summary = sync_menu_permissions([
+                {'name': 'system', 'children': [
+                    {'name': 'user', 'children': [{'name': 'user_add'}]},
+                    {'name': 'role'},
+                ]},
+                {'name': 'log'},
+            ])
+        self.assertEqual(summary, {'created': 0, 'updated': 0, 'deleted': 0})
+
+    def test_query_count_does_not_grow_with_menu_size(self):
+        # Django 按每 100 个主键一条 DELETE 分批删除，规模取在同一批次内
+        query_counts = []
+        for size in (20, 95):
+            Permission.objects.all().delete()
+            with CaptureQueriesContext(connection) as create_queries:
+                summary = sync_menu_permissions(menu_tree(size))
+            self.assertEqual(summary['created'], size)
+            with CaptureQueriesContext(connection) as replace_queries:
+                summary = sync_menu_permissions(menu_tree(size, prefix='renamed'))
+            self.assertEqual(summary, {'created': size, 'updated': 0, 'deleted': size})
+            query_counts.append((len(create_queries), len(replace_queries)))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(Permission.objects.count(), 95)
+
+
+@override_settings(ROOT_URLCONF='rbac_app.urls')
+class ReplaceRolePermissionsTests(APITestCase):
+    """
+    角色权限按集合语义替换：只增删差异部分，未变化的行保持不动，查询次数与权限数量无关。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name='editor')
+        cls.other_role = Role.objects.create(name='viewer')
+        cls.permissions = Permission.objects.bulk_create(
+            [Permission(name=f'p{i}', codename=f'p{i}') for i in range(100)]
+        )
+        cls.admin = CustomUser.objects.create(username='admin', name='Admin', is_superuser=True)
+
+    def grant(self, role, permissions):
+        return {
+            perm.pk: row.pk for perm, row in zip(permissions, RolePermission.objects.bulk_create(
+                [RolePermission(role=role, permission=perm) for perm in permissions]
+            ))
+        }
+
+    def role_permission_rows(self, role):
+        return dict(RolePermission.objects.filter(role=role).values_list('permission_id', 'id'))
+
+    def test_only_differences_are_written(self):
+        before = self.grant(self.role, self.permissions[:3])
+        desired = {perm.pk for perm in self.permissions[1:4]}
+
+        summary = replace_role_permissions({self.role.pk: desired})
+
+        self.assertEqual(summary, {'added': 1, 'removed': 1})
+        after = self.role_permission_rows(self.role)
+        self.assertEqual(set(after), desired)
+        # 保留下来的行没有被删除重建
+        for perm in self.permissions[1:3]:
+            self.assertEqual(after[perm.pk], before[perm.pk])
+
+    def test_unchanged_set_writes_nothing(self):
+        self.grant(self.role, self.permissions[:3])
+
+        with mock.patch('rbac_app.utils.bump_rbac_version') as bump:
+            summary = replace_role_permissions({self.role.pk: {perm.pk for perm in self.permissions[:3]}})
+
+        self.assertEqual(summary, {'added': 0, 'removed': 0})
+        bump.assert_not_called()
+
+    def test_query_count_does_not_grow_with_permission_count(self):
+        query_counts = []
+        for size in (5, 50):
+            RolePermission.objects.all().delete()
+            self.grant(self.role, self.permissions[size:size * 2])
+            with CaptureQueriesContext(connection) as queries:
+                summary = replace_role_permissions({self.role.pk: {perm.pk for perm in self.permissions[:size]}})
+            self.assertEqual(summary, {'added': size, 'removed': size})
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_batch_update_replaces_each_role(self):
+        self.grant(self.role, self.permissions[:2])
+        self.grant(self.other_role, self.permissions[2:4])
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.put('/role-permissions/batch/', {'roles': [
+            {'role_id': self.role.pk, 'permissions': [{'id': self.permissions[1].pk}, {'id': self.permissions[4].pk}]},
+            {'role_id': self.other_role.pk, 'permissions': [{'id': self.permissions[2].pk}]},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['added'], response.data['removed']), (1, 2))
+        self.assertEqual(set(self.role_permission_rows(self.role)),
+                         {self.permissions[1].pk, self.permissions[4].pk})
+        self.assertEqual(set(self.role_permission_rows(self.other_role)), {self.permissions[2].pk})
+
+    def test_batch_update_with_invalid_permission_changes_nothing(self):
+        self.grant(self.role, self.permissions[:2])
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.put('/role-permissions/batch/', {'roles': [
+            {'role_id': self.role.pk, 'permissions': [{'id': self.permissions[5].pk}]},
+            {'role_id': self.other_role.pk, 'permissions': [{'id': 0}]},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(self.role_permission_rows(self.role)), {perm.pk for perm in self.permissions[:2]})
+
+
+@override_settings(ROOT_URLCONF='rbac_app.urls')
+class SetUserRolesTests(APITestCase):
+    """
+    用户角色按差异批量写入，查询次数与角色数量无关，失败时整体回滚。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = Role.objects.bulk_create([Role(name=f'role_{i}') for i in range(60)])
+        cls.user = CustomUser.objects.create(username='member', name='Member')
+        cls.admin = CustomUser.objects.create(username='admin', name='Admin', is_superuser=True)
+
+    def user_role_rows(self, user):
+        return dict(UserRole.objects.filter(user=user).values_list('role_id', 'id'))
+
+    def test_only_differences_are_written(self):
+        before = {role.pk: UserRole.objects.create(user=self.user, role=role).pk for role in self.roles[:2]}
+
+        summary = set_user_roles(self.user, [self.roles[1].pk, self.roles[2], 0])
+
+        self.assertEqual(summary, {'added': 1, 'removed': 1})
+        after = self.user_role_rows(self.user)
+        self.assertEqual(set(after), {self.roles[1].pk, self.roles[2].pk})
+        self.assertEqual(after[self.roles[1].pk], before[self.roles[1].pk])
+
+    def test_query_count_does_not_grow_with_role_count(self):
+        query_counts = []
+        for size in (3, 30):
+            UserRole.objects.bulk_create([UserRole(user=self.user, role=role) for role in self.roles[size:size * 2]])
+            with CaptureQueriesContext(connection) as queries:
+                summary = set_user_roles(self.user, [role.pk for role in self.roles[:size]])
+            self.assertEqual(summary, {'added': size, 'removed': size})
+            UserRole.objects.filter(user=self.user).delete()
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_failure_rolls_back_added_and_removed_roles(self):
+        UserRole.objects.create(user=self.user, role=self.roles[0])
+
+        with mock.patch('rbac_app.utils.bump_rbac_version', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                set_user_roles(self.user, [self.roles[1].pk])
+
+        self.assertEqual(set(self.user_role_rows(self.user)), {self.roles[0].pk})
+
+    def test_update_view_rolls_back_user_fields_with_roles(self):
+        UserRole.objects.create(user=self.user, role=self.roles[0])
+        self.client.force_authenticate(self.admin)
+
+        with mock.patch('rbac_app.utils.bump_rbac_version', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.patch(f'/all-users-permissions/{self.user.pk}/',
+                                  {'name': 'Renamed', 'roles': [self.roles[1].pk]}, format='json')
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Member')
+        self.assertEqual(set(self.user_role_rows(self.user)), {self.roles[0].pk})
+
+
+@override_settings(ROOT_URLCONF='rbac_app.urls')
+class ConditionalGetTests(APITestCase):
+    """
+    使用 ConditionalGetMixin 的接口：If-None-Match 命中时返回 304 且不执行查询，RBAC 版本号递增后 ETag 变化。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name='editor')
+        permission = Permission.objects.create(name='系统管理', codename='system')
+        RolePermission.objects.create(role=cls.role, permission=permission)
+        cls.admin = CustomUser.objects.create(username='admin', name='Admin', is_superuser=True)
+        cls.urls = [
+            '/roles/',
+            f'/roles/{cls.role.pk}/',
+            '/permissions/',
+            f'/permissions/{permission.pk}/',
+            '/permissions/tree/',
+            '/role-permissions/',
+            f'/role-permissions/{cls.role.pk}/',
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def test_if_none_match_returns_304_until_version_changes(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+
+                with self.assertNumQueries(0):
+                    not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified['ETag'], etag)
+
+                _incr_rbac_version()
+                changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(changed.status_code, 200)
+                self.assertNotEqual(changed['ETag'], etag)
+
+    def test_etag_depends_on_query_parameters(self):
+        first = self.client.get('/roles/', {'pageSize': 5})
+        second = self.client.get('/roles/', {'pageSize': 10})
+
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        self.assertEqual(self.client.get('/roles/', {'pageSize': 10}, HTTP_IF_NONE_MATCH=first['ETag']).status_code,
+                         200)
+
+
+@override_settings(ROOT_URLCONF='rbac_app.urls')
+class UserMenuETagTests(TestCase):
+    """
+    菜单接口的 ETag 由菜单内容计算：内容未变化时返回 304（包括 RBAC 版本号递增后），内容变化后返回新的 ETag。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name='editor')
+        RolePermission.objects.create(role=cls.role, permission=Permission.objects.create(name='系统管理', codename='system'))
+        cls.user = CustomUser.objects.create(username='member', name='Member')
+        UserRole.objects.create(user=cls.user, role=cls.role)
+
+    def setUp(self):
+        cache.clear()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def get_menu(self, etag=None):
+        headers = dict(self.headers, **({'If-None-Match': etag} if etag else {}))
+        return await AsyncClient().get('/menu', headers=headers)
+
+    async def test_if_none_match_returns_304(self):
+        response = await self.get_menu()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['permission__name'] for item in json.loads(response.content)['menu']], ['系统管理'])
+
+        not_modified = await self.get_menu(response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+        # 版本号递增但菜单内容不变，ETag 不变
+        await sync_to_async(_incr_rbac_version)()
+        self.assertEqual((await self.get_menu(response['ETag'])).status_code, 304)
+
+    async def test_etag_changes_with_menu(self):
+        etag = (await self.get_menu())['ETag']
+
+        permission = await Permission.objects.acreate(name='日志', codename='log')
+        await RolePermission.objects.acreate(role=self.role, permission=permission)
+        await sync_to_async(_incr_rbac_version)()
+
+        response = await self.get_menu(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(json.loads(response.content)['menu']), 2)
+
+
+PBKDF2_HASHER = 'rbac_app.hashers.ConfigurablePBKDF2PasswordHasher'
+SCRYPT_HASHER = 'rbac_app.hashers.ConfigurableScryptPasswordHasher'
+
+
+@override_settings(
+    AUTHENTICATION_BACKENDS=['rbac_app.backends.PooledModelBackend'],
+    PASSWORD_HASHERS=[PBKDF2_HASHER, SCRYPT_HASHER],
+    RBAC_PASSWORD_HASH_PARAMS={
+        'pbkdf2_sha256': {'iterations': 1000},
+        'scrypt': {'work_factor': 2 ** 10, 'block_size': 8, 'parallelism': 1},
+    },
+)
+class PasswordRehashTests(TestCase):
+    """
+    哈希参数从 RBAC_PASSWORD_HASH_PARAMS 读取；参数或策略变化后，登录时按新策略重新哈希。
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='member', password='s3cret-pass')
+
+    def stored_password(self):
+        self.user.refresh_from_db()
+        return self.user.password
+
+    def test_params_override_class_defaults(self):
+        self.assertTrue(self.stored_password().startswith('pbkdf2_sha256$1000$'))
+        self.assertEqual(get_hasher('pbkdf2_sha256').iterations, 1000)
+        self.assertEqual(get_hasher('scrypt').work_factor, 2 ** 10)
+        with override_settings(RBAC_PASSWORD_HASH_PARAMS={}):
+            self.assertEqual(get_hasher('pbkdf2_sha256').iterations, PBKDF2PasswordHasher.iterations)
+
+    @override_settings(RBAC_PASSWORD_HASH_PARAMS={'pbkdf2_sha256': {'iterations': 2000}})
+    def test_login_rehashes_when_params_change(self):
+        self.assertEqual(authenticate(username='member', password='s3cret-pass'), self.user)
+
+        self.assertTrue(self.stored_password().startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(self.user.check_password('s3cret-pass'))
+
+    @override_settings(PASSWORD_HASHERS=[SCRYPT_HASHER, PBKDF2_HASHER])
+    def test_login_rehashes_when_algorithm_changes(self):
+        user = async_to_sync(aauthenticate)(username='member', password='s3cret-pass')
+
+        self.assertEqual(user, self.user)
+        self.assertTrue(self.stored_password().startswith(f'scrypt${2 ** 10}$'))
+        self.assertTrue(self.user.check_password('s3cret-pass'))
+
+    @override_settings(RBAC_PASSWORD_HASH_PARAMS={'pbkdf2_sha256': {'iterations': 2000}})
+    def test_wrong_password_does_not_rehash(self):
+        before = self.stored_password()
+
+        self.assertIsNone(authenticate(username='member', password='wrong'))
+        self.assertEqual(self.stored_password(), before)
+
+
+class RbacVersionBumpTests(TransactionTestCase):
+    """
+    同一事务中的多次写入（包括 QuerySet.delete() 逐行触发的信号）只在提交后递增一次版本号，
+    回滚的事务或保存点不递增，也不影响之后的登记。
+    """
+
+    def setUp(self):
+        self.role = Role.objects.create(name='role')
+        permissions = Permission.objects.bulk_create([Permission(name=f'p{i}', codename=f'p{i}') for i in range(50)])
+        RolePermission.objects.bulk_create([RolePermission(role=self.role, permission=perm) for perm in permissions])
+        patcher = mock.patch('rbac_app.utils._incr_rbac_version')
+        self.incr = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_replace_role_permissions_bumps_once_after_commit(self):
+        with transaction.atomic():
+            replace_role_permissions({self.role.pk: []})
+            self.incr.assert_not_called()
+        self.incr.assert_called_once()
+        self.assertFalse(RolePermission.objects.exists())
+
+    def test_menu_sync_delete_bumps_once_after_commit(self):
+        with transaction.atomic():
+            sync_menu_permissions([])
+        self.incr.assert_called_once()
+        self.assertFalse(Permission.objects.exclude(codename__startswith=Permission.ACTION_CODENAME_PREFIX).exists())
+
+    def test_rolled_back_savepoint_does_not_swallow_later_bump(self):
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    bump_rbac_version()
+                    raise ValueError
+            except ValueError:
+                pass
+            bump_rbac_version()
+            bump_rbac_version()
+        self.incr.assert_called_once()
+
+    def test_rolled_back_transaction_does_not_swallow_next_transaction(self):
+        try:
+            with transaction.atomic():
+                bump_rbac_version()
+                raise ValueError
+        except ValueError:
+            pass
+        self.incr.assert_not_called()
+
+        with transaction.atomic():
+            bump_rbac_version()
+        self.incr.assert_called_once()
+
+        # 事务之外立即递增
+        bump_rbac_version()
+        self.assertEqual(self.incr.call_count, 2)
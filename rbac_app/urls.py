@@ -4,7 +4,8 @@ from rest_framework.routers import DefaultRouter
 from .views import RoleViewSet, PermissionViewSet, UserRoleViewSet, RolePermissionViewSet, UserPermissionsViewSet, \
     AllUsersPermissionsViewSet, UserManagementViewSet, CustomUserViewSet, LoginView, UserInfoView, UserMenuView, \
     MenuToPermissionAPIView
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenObtainPairView
+from .authentication import RbacTokenRefreshView
 router = DefaultRouter()
 router.register(r'users', CustomUserViewSet)
 router.register(r'roles', RoleViewSet)
@@ -19,7 +20,7 @@ router.register(r'all-users', UserManagementViewSet, basename='user-management')
 urlpatterns = [
     path('', include(router.urls)),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  # 获取访问令牌
-    path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),  # 刷新令牌
+    path('refresh/', RbacTokenRefreshView.as_view(), name='token_refresh'),  # 刷新令牌（开启 RBAC_JWT_CLAIMS 时写入最新权限摘要）
     path('login', LoginView.as_view(), name='login'),
     path('userInfo', UserInfoView.as_view(), name='userInfo'),
     path('menu', UserMenuView.as_view(), name='userMenu'),
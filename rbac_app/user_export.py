@@ -0,0 +1,81 @@
+# rbac/user_export.py
+# ==========================
+# Streaming User Export / 流式导出用户
+# ==========================
+# 逐行产出 CSV / NDJSON 文本，配合 StreamingHttpResponse 使用，导出过程中不在内存中累积数据。
+# WSGI 使用同步生成器，ASGI 使用异步生成器（a 前缀）。
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# 导出的用户字段
+EXPORT_FIELDS = ['id', 'username', 'name', 'email', 'phone_number', 'address', 'is_active', 'last_login',
+                 'date_joined']
+# 服务端游标每次读取的行数
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """
+    只返回写入内容的伪文件对象，让 csv.writer 逐行产出字符串。
+    """
+
+    def write(self, value):
+        return value
+
+
+def _clean_roles(roles_json):
+    # 没有角色的用户子查询结果为 NULL
+    return [role for role in roles_json or [] if role and role.get('id') is not None]
+
+
+def _csv_line(writer, row):
+    roles = ';'.join(role['name'] for role in _clean_roles(row['roles_json']))
+    return writer.writerow([row[field] for field in EXPORT_FIELDS] + [roles])
+
+
+def _ndjson_line(row):
+    data = {field: row[field] for field in EXPORT_FIELDS}
+    data['roles'] = _clean_roles(row['roles_json'])
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def export_users_csv(rows):
+    """
+    :param rows: 用户字典迭代器（包含 EXPORT_FIELDS 和 roles_json）
+    :return: CSV 文本行生成器，角色列为以分号分隔的角色名称
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS + ['roles'])
+    for row in rows:
+        yield _csv_line(writer, row)
+
+
+def export_users_ndjson(rows):
+    """
+    :param rows: 用户字典迭代器（包含 EXPORT_FIELDS 和 roles_json）
+    :return: NDJSON 文本行生成器，roles 为 [{"id": ..., "name": ...}] 列表
+    """
+    for row in rows:
+        yield _ndjson_line(row)
+
+
+async def aexport_users_csv(rows):
+    """
+    export_users_csv 的异步版本，rows 为异步迭代器（QuerySet.aiterator()）。
+    ASGI 下 StreamingHttpResponse 会先把同步迭代器整体读入内存，需要传入异步迭代器才能逐块发送。
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS + ['roles'])
+    async for row in rows:
+        yield _csv_line(writer, row)
+
+
+async def aexport_users_ndjson(rows):
+    """
+    export_users_ndjson 的异步版本，rows 为异步迭代器（QuerySet.aiterator()）。
+    """
+    async for row in rows:
+        yield _ndjson_line(row)
@@ -0,0 +1,224 @@
+# rbac/user_import.py
+# ==========================
+# Bulk User Import / 批量导入用户
+# ==========================
+# 流式读取 CSV / JSON Lines 文件，按块校验、并行哈希密码、批量写入用户和用户角色。
+# 每块只执行固定次数的查询：用户名查重、角色校验、用户 bulk_create、角色 bulk_create。
+
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .hashing import hash_password, init_worker
+from .models import CustomUser, Role, UserRole
+from .serializers import CustomUserSerializer
+from .utils import bump_rbac_version
+
+# 每块处理的行数
+IMPORT_CHUNK_SIZE = getattr(settings, 'RBAC_IMPORT_CHUNK_SIZE', 1000)
+# 哈希密码的并发数（进程或线程）
+IMPORT_HASH_WORKERS = getattr(settings, 'RBAC_IMPORT_HASH_WORKERS', os.cpu_count() or 1)
+# 小于该大小的文件在请求中同步导入，超过时交给 Celery 异步导入
+IMPORT_SYNC_MAX_SIZE = getattr(settings, 'RBAC_IMPORT_SYNC_MAX_SIZE', 1024 * 1024)
+# 报告中最多保留的错误行数
+IMPORT_MAX_ERRORS = 1000
+
+
+class CustomUserImportSerializer(CustomUserSerializer):
+    """
+    导入使用的校验规则与 CustomUserSerializer 一致，
+    只是用户名唯一性改为按块一次查询校验，而不是逐行查询。
+    """
+
+    class Meta(CustomUserSerializer.Meta):
+        extra_kwargs = {'username': {'validators': []}}
+
+    def validate_username(self, value):
+        CustomUser.username_validator(value)
+        return value
+
+
+def read_rows(file_obj, file_format):
+    """
+    流式读取上传文件，逐行产出字典。
+    :param file_obj: 二进制文件对象
+    :param file_format: 'csv' 或 'jsonl'
+    """
+    text = io.TextIOWrapper(file_obj, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        for row in csv.DictReader(text):
+            # 空单元格视为未提供该字段
+            row = {key: value for key, value in row.items() if value not in ('', None)}
+            # CSV 中的角色以分号分隔，如 "1;3"
+            roles = row.pop('roles', '') or ''
+            row['roles'] = [role_id.strip() for role_id in roles.split(';') if role_id.strip()]
+            yield row
+    elif file_format == 'jsonl':
+        for line in text:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unsupported import format '{file_format}'")
+
+
+def detect_format(file_name):
+    extension = os.path.splitext(file_name)[1].lower()
+    return 'jsonl' if extension in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+
+def import_users(rows, chunk_size=IMPORT_CHUNK_SIZE, hash_workers=IMPORT_HASH_WORKERS, progress_callback=None,
+                 hash_in_threads=False):
+    """
+    批量导入用户。
+    :param rows: 可迭代的行字典（可以是生成器，按块消费，内存占用与文件大小无关）
+    :param chunk_size: 每块行数
+    :param hash_workers: 哈希密码的并发数，为 1 时在当前线程中计算
+    :param progress_callback: 每块完成后调用，参数为当前报告
+    :param hash_in_threads: 使用线程池而不是进程池哈希。Celery prefork worker 是守护进程，不能再创建子进程，
+        在任务中必须为 True；内置哈希算法（PBKDF2、scrypt、argon2）计算时会释放 GIL，线程同样可以并行
+    :return: 报告 {'total': n, 'created': n, 'failed': n, 'errors': [{'row': 行号, 'errors': {...}}]}
+    """
+    report = {'total': 0, 'created': 0, 'failed': 0, 'errors': []}
+    rows = iter(rows)
+    if hash_workers <= 1:
+        pool = None
+    elif hash_in_threads:
+        pool = ThreadPoolExecutor(max_workers=hash_workers)
+    else:
+        pool = ProcessPoolExecutor(max_workers=hash_workers, initializer=init_worker)
+
+    try:
+        row_number = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            numbered = list(enumerate(chunk, start=row_number + 1))
+            row_number += len(chunk)
+            _import_chunk(numbered, pool, report)
+            if progress_callback is not None:
+                progress_callback(report)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    report['errors'].sort(key=lambda error: error['row'])
+    return report
+
+
+def _record_error(report, row_number, errors):
+    report['failed'] += 1
+    if len(report['errors']) < IMPORT_MAX_ERRORS:
+        report['errors'].append({'row': row_number, 'errors': errors})
+
+
+def _import_chunk(numbered_rows, pool, report):
+    report['total'] += len(numbered_rows)
+
+    # 1. 字段校验（不查询数据库）
+    valid = []
+    for row_number, row in numbered_rows:
+        serializer = CustomUserImportSerializer(data=row)
+        if not serializer.is_valid():
+            _record_error(report, row_number, serializer.errors)
+            continue
+        roles = row.get('roles') or []
+        if not isinstance(roles, list):
+            # 字符串等非列表值不能逐项迭代，例如 "12" 会被拆成角色 1 和 2
+            _record_error(report, row_number, {'roles': ['Roles must be a list of role ids.']})
+            continue
+        try:
+            if any(isinstance(role_id, bool) for role_id in roles):
+                raise TypeError
+            role_ids = {int(role_id) for role_id in roles}
+        except (TypeError, ValueError):
+            _record_error(report, row_number, {'roles': ['Role ids must be integers.']})
+            continue
+        valid.append((row_number, serializer.validated_data, role_ids))
+
+    # 2. 用户名查重（块内重复 + 数据库中已存在），一次查询
+    usernames = [data['username'] for _, data, _ in valid]
+    taken = set(CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True))
+    # 3. 角色校验，一次查询
+    requested_roles = set().union(*(role_ids for _, _, role_ids in valid)) if valid else set()
+    existing_roles = set(Role.objects.filter(id__in=requested_roles).values_list('id', flat=True))
+
+    accepted = []
+    for row_number, data, role_ids in valid:
+        if data['username'] in taken:
+            _record_error(report, row_number, {'username': ['A user with that username already exists.']})
+            continue
+        missing = role_ids - existing_roles
+        if missing:
+            _record_error(report, row_number, {'roles': [f'Invalid role id(s): {sorted(missing)}']})
+            continue
+        taken.add(data['username'])
+        accepted.append((row_number, data, role_ids))
+
+    if not accepted:
+        return
+
+    # 4. 并行哈希密码
+    raw_passwords = [data.pop('password') for _, data, _ in accepted]
+    if pool is not None:
+        hashed = list(pool.map(hash_password, raw_passwords, chunksize=max(1, len(raw_passwords) // 32)))
+    else:
+        hashed = [hash_password(raw_password) for raw_password in raw_passwords]
+
+    users = [CustomUser(password=password, **data) for (_, data, _), password in zip(accepted, hashed)]
+
+    # 5. 批量写入用户和角色
+    try:
+        with transaction.atomic():
+            CustomUser.objects.bulk_create(users)
+            if any(user.pk is None for user in users):
+                # 不支持 RETURNING 的数据库需要回查主键
+                ids = dict(CustomUser.objects.filter(username__in=[user.username for user in users])
+                           .values_list('username', 'id'))
+                for user in users:
+                    user.pk = ids[user.username]
+            user_roles = [
+                UserRole(user_id=user.pk, role_id=role_id)
+                for user, (_, _, role_ids) in zip(users, accepted)
+                for role_id in role_ids
+            ]
+            UserRole.objects.bulk_create(user_roles)
+            if user_roles:
+                bump_rbac_version()
+    except IntegrityError as e:
+        # 并发导入导致用户名冲突时，整块标记失败，不写入部分数据
+        for row_number, _, _ in accepted:
+            _record_error(report, row_number, {'non_field_errors': [str(e)]})
+        return
+
+    report['created'] += len(users)
+
+
+# ==========================
+# Import Progress / 导入进度
+# ==========================
+# 进度保存在 Django 缓存中，不依赖 Celery 结果后端。
+# Celery worker 写入、Web 进程读取，要求默认缓存在进程间共享（见 settings.CACHES）；
+# 缓存为进程内缓存时视图改为同步导入。
+
+IMPORT_PROGRESS_TIMEOUT = 24 * 60 * 60
+
+
+def import_progress_key(import_id):
+    return f'rbac:import:{import_id}'
+
+
+def set_import_progress(import_id, status, report=None):
+    cache.set(import_progress_key(import_id), {'status': status, **(report or {})}, timeout=IMPORT_PROGRESS_TIMEOUT)
+
+
+def get_import_progress(import_id):
+    return cache.get(import_progress_key(import_id))
@@ -0,0 +1,582 @@
+# rbac/utils.py
+# ==========================
+# RBAC Cache Utilities / 权限缓存工具
+# ==========================
+# 用户的角色与权限在登录、菜单轮询中被频繁读取，但很少变化。
+# 这里使用一个全局的 RBAC 版本号作为缓存命名空间：
+# 任何对 UserRole、RolePermission、Permission 的写入都会递增版本号，
+# 旧版本下的缓存自然失效，无需逐个删除缓存键。
+
+import hashlib
+import json
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CustomUser, Role, Permission, UserRole, RolePermission
+
+RBAC_VERSION_KEY = 'rbac:version'
+# 缓存有效期（秒），可在 settings 中通过 RBAC_CACHE_TIMEOUT 覆盖
+RBAC_CACHE_TIMEOUT = getattr(settings, 'RBAC_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_rbac_version():
+    """
+    获取当前的 RBAC 版本号，不存在时初始化为 1。
+    """
+    version = cache.get(RBAC_VERSION_KEY)
+    if version is None:
+        cache.add(RBAC_VERSION_KEY, 1, timeout=None)
+        version = cache.get(RBAC_VERSION_KEY, 1)
+    return version
+
+
+async def aget_rbac_version():
+    """
+    get_rbac_version 的异步版本。
+    """
+    version = await cache.aget(RBAC_VERSION_KEY)
+    if version is None:
+        await cache.aadd(RBAC_VERSION_KEY, 1, timeout=None)
+        version = await cache.aget(RBAC_VERSION_KEY, 1)
+    return version
+
+
+def _incr_rbac_version():
+    try:
+        cache.incr(RBAC_VERSION_KEY)
+    except ValueError:
+        # 版本号不存在（缓存被清空或尚未初始化），重新初始化
+        cache.set(RBAC_VERSION_KEY, 2, timeout=None)
+
+
+def bump_rbac_version():
+    """
+    递增 RBAC 版本号，使所有已缓存的权限数据失效。
+    在事务中调用时推迟到事务提交后执行，
+    避免并发读取在提交前把旧数据写回新版本的缓存；事务回滚时不会递增。
+    同一事务中多次调用只登记一次递增：QuerySet.delete() 等逐行触发信号的写入不会堆积成百上千个回调。
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _incr_rbac_version()
+        return
+
+    # 连接上只保存已登记回调的弱引用：回调执行时清除标记；
+    # 所在事务或保存点回滚时 Django 丢弃回调，弱引用随之失效，之后的调用会重新登记
+    pending = getattr(connection, '_rbac_pending_bump', None)
+    if pending is not None and pending() is not None:
+        return
+    callback = _PendingVersionBump(connection)
+    connection._rbac_pending_bump = weakref.ref(callback)
+    transaction.on_commit(callback)
+
+
+class _PendingVersionBump:
+    """
+    事务提交后执行的版本号递增（见 bump_rbac_version）。
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __call__(self):
+        self.connection._rbac_pending_bump = None
+        _incr_rbac_version()
+
+
+def _user_roles_cache_key(user_id, version):
+    return f'rbac:user_roles:{version}:{user_id}'
+
+
+def _role_set_cache_key(role_ids, version):
+    return f'rbac:role_set:{version}:{",".join(map(str, role_ids))}'
+
+
+def _user_role_ids_queryset(user):
+    return UserRole.objects.filter(user_id=user.pk).values_list('role_id', flat=True)
+
+
+def get_user_role_ids(user):
+    """
+    获取用户的角色 ID 列表（升序，带缓存）。
+    """
+    key = _user_roles_cache_key(user.pk, get_rbac_version())
+    role_ids = cache.get(key)
+    if role_ids is None:
+        role_ids = sorted(_user_role_ids_queryset(user))
+        cache.set(key, role_ids, timeout=RBAC_CACHE_TIMEOUT)
+    return role_ids
+
+
+async def aget_user_role_ids(user):
+    """
+    get_user_role_ids 的异步版本（异步缓存 + 异步 ORM）。
+    """
+    key = _user_roles_cache_key(user.pk, await aget_rbac_version())
+    role_ids = await cache.aget(key)
+    if role_ids is None:
+        role_ids = sorted([role_id async for role_id in _user_role_ids_queryset(user)])
+        await cache.aset(key, role_ids, timeout=RBAC_CACHE_TIMEOUT)
+    return role_ids
+
+
+def _user_flags_cache_key(user_id, version):
+    return f'rbac:user_flags:{version}:{user_id}'
+
+
+def _user_flags_queryset(user):
+    return CustomUser.objects.filter(pk=user.pk).values(*CustomUser.ACCOUNT_FLAGS)
+
+
+def get_user_account_flags(user):
+    """
+    获取用户的账号状态 {'is_active': ..., 'is_superuser': ...}（带缓存），用户不存在时返回空字典。
+    """
+    key = _user_flags_cache_key(user.pk, get_rbac_version())
+    flags = cache.get(key)
+    if flags is None:
+        flags = next(iter(_user_flags_queryset(user)), {})
+        cache.set(key, flags, timeout=RBAC_CACHE_TIMEOUT)
+    return flags
+
+
+async def aget_user_account_flags(user):
+    """
+    get_user_account_flags 的异步版本（异步缓存 + 异步 ORM）。
+    """
+    key = _user_flags_cache_key(user.pk, await aget_rbac_version())
+    flags = await cache.aget(key)
+    if flags is None:
+        flags = await _user_flags_queryset(user).afirst() or {}
+        await cache.aset(key, flags, timeout=RBAC_CACHE_TIMEOUT)
+    return flags
+
+
+def _role_set_queryset(role_ids):
+    # 一次查询同时取出角色和权限（LEFT JOIN，没有权限的角色也会返回）
+    return Role.objects.filter(id__in=role_ids).values_list(
+        'id',
+        'name',
+        'role_permissions__permission__id',
+        'role_permissions__permission__name',
+        'role_permissions__permission__codename',
+        'role_permissions__permission__parent_id',
+    ).order_by('id', 'role_permissions__permission__id')
+
+
+def _build_role_set_permissions(rows):
+    role_names = []
+    menu = []
+    # 按权限去重，供不需要角色信息的接口使用
+    permissions = []
+    seen_roles = set()
+    seen_permissions = set()
+    for role_id, role_name, permission_id, permission_name, codename, parent_id in rows:
+        if role_id not in seen_roles:
+            seen_roles.add(role_id)
+            role_names.append(role_name)
+        if permission_id is None:
+            continue
+        # 接口操作权限不是菜单项
+        if not codename.startswith(Permission.ACTION_CODENAME_PREFIX):
+            menu.append({
+                'permission__id': permission_id,
+                'permission__name': permission_name,
+                'permission__codename': codename,
+                'permission__parent_id': parent_id,
+                'role__name': role_name,
+            })
+        if permission_id not in seen_permissions:
+            seen_permissions.add(permission_id)
+            permissions.append({
+                'permission__id': permission_id,
+                'permission__name': permission_name,
+                'permission__codename': codename,
+            })
+
+    return {
+        'role_names': role_names,
+        'menu': menu,
+        'permissions': permissions,
+    }
+
+
+def get_role_set_permissions(role_ids):
+    """
+    获取一组角色的名称与权限（带缓存）。
+    很多用户拥有相同的角色组合，缓存以升序角色 ID 元组为键，相同角色组合的用户共享同一份数据。
+    未命中时一次查询同时取出角色和权限。
+    :param role_ids: 角色 ID 列表
+    :return: 字典，包含 role_names、menu、permissions（含义见 get_effective_permissions）
+    """
+    role_ids = tuple(sorted(set(role_ids)))
+    key = _role_set_cache_key(role_ids, get_rbac_version())
+    data = cache.get(key)
+    if data is None:
+        data = _build_role_set_permissions(_role_set_queryset(role_ids) if role_ids else [])
+        cache.set(key, data, timeout=RBAC_CACHE_TIMEOUT)
+    return data
+
+
+async def aget_role_set_permissions(role_ids):
+    """
+    get_role_set_permissions 的异步版本。
+    """
+    role_ids = tuple(sorted(set(role_ids)))
+    key = _role_set_cache_key(role_ids, await aget_rbac_version())
+    data = await cache.aget(key)
+    if data is None:
+        rows = [row async for row in _role_set_queryset(role_ids)] if role_ids else []
+        data = _build_role_set_permissions(rows)
+        await cache.aset(key, data, timeout=RBAC_CACHE_TIMEOUT)
+    return data
+
+
+def _menu_document_cache_key(role_ids, version):
+    return f'rbac:menu_doc:{version}:{",".join(map(str, role_ids))}'
+
+
+def _build_menu_document(data):
+    menu = []
+    seen = set()
+    for row in data['menu']:
+        if row['permission__id'] not in seen:
+            seen.add(row['permission__id'])
+            menu.append(row)
+
+    body = json.dumps({'roles': data['role_names'], 'menu': menu}, ensure_ascii=False).encode()
+    return {'etag': f'"{hashlib.sha1(body).hexdigest()}"', 'body': body}
+
+
+def get_menu_document(role_ids):
+    """
+    获取一组角色的菜单文档（带缓存）：预先序列化好的 JSON 字节串及其 ETag。
+    相同角色组合的用户共享同一份文档，命中缓存时不访问数据库，也不需要 JSON 编码。
+    菜单按权限去重，同一权限被多个角色授予时只保留一行（role__name 为其中 ID 最小的角色）。
+    :param role_ids: 角色 ID 列表
+    :return: 字典 {'etag': '"..."', 'body': b'...'}
+    """
+    role_ids = tuple(sorted(set(role_ids)))
+    key = _menu_document_cache_key(role_ids, get_rbac_version())
+    document = cache.get(key)
+    if document is None:
+        document = _build_menu_document(get_role_set_permissions(role_ids))
+        cache.set(key, document, timeout=RBAC_CACHE_TIMEOUT)
+    return document
+
+
+async def aget_menu_document(role_ids):
+    """
+    get_menu_document 的异步版本。
+    """
+    role_ids = tuple(sorted(set(role_ids)))
+    key = _menu_document_cache_key(role_ids, await aget_rbac_version())
+    document = await cache.aget(key)
+    if document is None:
+        document = _build_menu_document(await aget_role_set_permissions(role_ids))
+        await cache.aset(key, document, timeout=RBAC_CACHE_TIMEOUT)
+    return document
+
+
+def get_effective_permissions(user):
+    """
+    获取用户的有效权限集合（带缓存）。
+    用户 -> 角色 ID 列表、角色组合 -> 权限数据分两级缓存，都以 RBAC 版本号为命名空间。
+    :param user: 用户对象
+    :return: 字典，包含：
+        - role_ids: 角色 ID 列表（升序）
+        - role_names: 角色名称列表
+        - menu: 权限行列表（含 role__name，与原 menu 结构一致）
+        - permissions: 去重后的权限行列表（不含角色信息）
+    """
+    role_ids = get_user_role_ids(user)
+    return {'role_ids': role_ids, **get_role_set_permissions(role_ids)}
+
+
+async def aget_effective_permissions(user):
+    """
+    get_effective_permissions 的异步版本，供 ASGI 下的异步视图使用。
+    """
+    role_ids = await aget_user_role_ids(user)
+    return {'role_ids': role_ids, **await aget_role_set_permissions(role_ids)}
+
+
+def get_user_codenames(request):
+    """
+    获取当前请求用户的权限 codename 集合。
+    结果在同一请求内缓存（挂在底层 HttpRequest 上），
+    同一请求中的多次权限判断只读取一次缓存/数据库。
+    :param request: DRF Request 或 Django HttpRequest
+    :return: frozenset of codename
+    """
+    http_request = getattr(request, '_request', request)
+    codenames = getattr(http_request, '_rbac_codenames', None)
+    if codenames is None:
+        effective = get_effective_permissions(request.user)
+        codenames = frozenset(row['permission__codename'] for row in effective['permissions'])
+        http_request._rbac_codenames = codenames
+    return codenames
+
+
+async def aget_user_codenames(request):
+    """
+    get_user_codenames 的异步版本（异步缓存 + 异步 ORM），与同步版本共用同一请求内的结果。
+    """
+    http_request = getattr(request, '_request', request)
+    codenames = getattr(http_request, '_rbac_codenames', None)
+    if codenames is None:
+        effective = await aget_effective_permissions(request.user)
+        codenames = frozenset(row['permission__codename'] for row in effective['permissions'])
+        http_request._rbac_codenames = codenames
+    return codenames
+
+def add_rbac_claims(token, user, role_ids, version):
+    """
+    在访问令牌中写入精简的权限摘要和常用用户信息（需开启 settings.RBAC_JWT_CLAIMS）。
+    摘要只包含角色 ID 列表和签发时的 RBAC 版本号；版本号过期且用户角色已变化的令牌需要刷新。
+    :param token: AccessToken 对象
+    :param user: 用户对象
+    :param role_ids: 用户的角色 ID 列表
+    :param version: 签发时的 RBAC 版本号
+    :return: token
+    """
+    token['roles'] = sorted(role_ids)
+    token['rbac_version'] = version
+    token['username'] = user.username
+    token['name'] = user.name
+    token['email'] = user.email
+    token['is_superuser'] = user.is_superuser
+    return token
+
+class MenuSyncError(ValueError):
+    """
+    菜单数据无效，无法同步到权限表。
+    """
+
+
+class MenuCycleError(MenuSyncError):
+    """
+    菜单树中存在循环引用（同名节点出现在自身的子孙位置）。
+    """
+
+
+def sync_menu_permissions(menu_items):
+    """
+    将前端菜单树同步到权限表（以 name 作为唯一标识，codename 与 name 相同）。
+    rbac: 前缀的接口操作权限不参与比对，不会被新增、移动或删除（连同角色授权）。
+    先计算出需要新增、修改父级（及 path）和删除的权限，再批量写入：
+    一次 bulk_create、一次只包含变化行的 bulk_update、一次 QuerySet.delete()。
+    调用方负责开启事务。
+    :param menu_items: 菜单树列表，每项包含 name 和可选的 children
+    :return: 变更摘要 {'created': n, 'updated': n, 'deleted': n}
+    :raises MenuCycleError: 菜单存在循环引用
+    :raises MenuSyncError: 菜单名称使用了保留前缀
+    """
+    # 展开菜单树为 {name: parent_name}，同名节点以最后出现的位置为准
+    desired_parents = {}
+    stack = [(item, None) for item in reversed(menu_items)]
+    while stack:
+        item, parent_name = stack.pop()
+        name = item['name']
+        if name.startswith(Permission.ACTION_CODENAME_PREFIX):
+            raise MenuSyncError(f"菜单名称不能使用保留前缀 {Permission.ACTION_CODENAME_PREFIX}：{name}")
+        desired_parents[name] = parent_name
+        for child in reversed(item.get('children') or []):
+            stack.append((child, name))
+
+    # 现有权限 {name: Permission}，只取同步需要的字段
+    existing = {
+        perm.name: perm for perm in Permission.objects.exclude(
+            codename__startswith=Permission.ACTION_CODENAME_PREFIX
+        ).only('id', 'name', 'parent_id', 'path')
+    }
+
+    # 新增：先不设置父级，创建后统一在下面的父级比对中处理
+    new_permissions = [
+        Permission(name=name, codename=name)
+        for name in desired_parents if name not in existing
+    ]
+    Permission.objects.bulk_create(new_permissions)
+    if any(permission.pk is None for permission in new_permissions):
+        # 不支持 RETURNING 的数据库（如 MySQL）需要回查主键，下面计算 path 依赖主键
+        ids = dict(Permission.objects.filter(name__in=[permission.name for permission in new_permissions])
+                   .values_list('name', 'id'))
+        for permission in new_permissions:
+            permission.pk = ids[permission.name]
+    for permission in new_permissions:
+        existing[permission.name] = permission
+
+    # 计算每个节点期望的祖先路径（path），与父级一起比对
+    desired_paths = {}
+
+    def resolve_path(name):
+        # 沿父级向上收集尚未计算的祖先，避免深层菜单触发递归深度限制
+        chain = []
+        while name is not None and name not in desired_paths:
+            if name in chain:
+                raise MenuCycleError(f"菜单存在循环引用：{name}")
+            chain.append(name)
+            name = desired_parents[name]
+        prefix = f'{desired_paths[name]}{existing[name].pk}/' if name is not None else '/'
+        for node_name in reversed(chain):
+            desired_paths[node_name] = prefix
+            prefix = f'{prefix}{existing[node_name].pk}/'
+
+    # 修改父级：只更新父级或路径确实发生变化的行
+    changed = []
+    for name, parent_name in desired_parents.items():
+        if name not in desired_paths:
+            resolve_path(name)
+        permission = existing[name]
+        parent_pk = existing[parent_name].pk if parent_name is not None else None
+        if permission.parent_id_id != parent_pk or permission.path != desired_paths[name]:
+            permission.parent_id_id = parent_pk
+            permission.path = desired_paths[name]
+            changed.append(permission)
+    Permission.objects.bulk_update(changed, ['parent_id', 'path'])
+
+    # 删除：菜单中已不存在的权限一次性删除
+    stale_ids = [perm.pk for name, perm in existing.items() if name not in desired_parents]
+    deleted = 0
+    if stale_ids:
+        Permission.objects.filter(pk__in=stale_ids).delete()
+        deleted = len(stale_ids)
+
+    if new_permissions or changed or deleted:
+        # 批量写入不会触发信号，手动使权限缓存失效
+        bump_rbac_version()
+
+    new_names = {permission.name for permission in new_permissions}
+    return {
+        'created': len(new_permissions),
+        'updated': len([perm for perm in changed if perm.name not in new_names]),
+        'deleted': deleted,
+    }
+
+
+def replace_role_permissions(role_permissions):
+    """
+    以集合语义替换一个或多个角色的权限。
+    与现有关联比对后，只新增缺少的、删除多余的，未变化的行保持不动，
+    因此并发读取不会看到角色"暂时没有权限"的中间状态。
+    在同一事务中完成：一次 bulk_create(ignore_conflicts=True) 和一次过滤删除。
+    :param role_permissions: {role_id: 权限 ID 集合}
+    :return: 变更摘要 {'added': n, 'removed': n}
+    """
+    role_permissions = {
+        int(role_id): {int(permission_id) for permission_id in permission_ids}
+        for role_id, permission_ids in role_permissions.items()
+    }
+
+    with transaction.atomic():
+        # 锁定涉及的角色，串行化同一角色的并发替换
+        list(Role.objects.select_for_update().filter(id__in=role_permissions).values_list('id', flat=True))
+
+        current = {role_id: {} for role_id in role_permissions}
+        rows = RolePermission.objects.filter(role_id__in=role_permissions).values_list('id', 'role_id', 'permission_id')
+        for row_id, role_id, permission_id in rows:
+            current[role_id][permission_id] = row_id
+
+        to_add = []
+        to_remove = []
+        for role_id, permission_ids in role_permissions.items():
+            existing = current[role_id]
+            to_add.extend(
+                RolePermission(role_id=role_id, permission_id=permission_id)
+                for permission_id in permission_ids - existing.keys()
+            )
+            to_remove.extend(
+                row_id for permission_id, row_id in existing.items() if permission_id not in permission_ids
+            )
+
+        if to_add:
+            RolePermission.objects.bulk_create(to_add, ignore_conflicts=True)
+        if to_remove:
+            RolePermission.objects.filter(id__in=to_remove).delete()
+
+        if to_add or to_remove:
+            # 批量写入不会触发 post_save 信号，手动使权限缓存失效
+            bump_rbac_version()
+
+    return {'added': len(to_add), 'removed': len(to_remove)}
+
+
+def set_user_roles(user, role_ids):
+    """
+    将用户的角色设置为给定集合（不存在的角色 ID 会被忽略）。
+    与当前角色比对后，在同一事务中执行一次 bulk_create(ignore_conflicts=True) 和一次过滤删除，
+    查询次数与角色数量无关，失败时不会留下部分更新的状态。
+    :param user: 用户对象
+    :param role_ids: 角色 ID 列表（或 Role 对象列表）
+    :return: 变更摘要 {'added': n, 'removed': n}
+    """
+    requested = {getattr(role, 'pk', role) for role in role_ids}
+
+    with transaction.atomic():
+        desired = set(Role.objects.filter(id__in=requested).values_list('id', flat=True)) if requested else set()
+        current = set(UserRole.objects.filter(user=user).values_list('role_id', flat=True))
+
+        to_add = desired - current
+        to_remove = current - desired
+
+        if to_add:
+            UserRole.objects.bulk_create(
+                [UserRole(user=user, role_id=role_id) for role_id in to_add],
+                ignore_conflicts=True
+            )
+        if to_remove:
+            UserRole.objects.filter(user=user, role_id__in=to_remove).delete()
+
+        if to_add or to_remove:
+            # 批量写入不会触发 post_save 信号，手动使权限缓存失效
+            bump_rbac_version()
+
+    return {'added': len(to_add), 'removed': len(to_remove)}
+
+def rebuild_permission_paths():
+    """
+    根据 parent_id 重新计算全部权限的 path（一次查询 + 只更新变化的行）。
+    用于 QuerySet.delete()、QuerySet.update() 等绕过 Permission.save()/delete() 的批量写入之后。
+    :return: 被修正的行数
+    """
+    permissions = {perm.pk: perm for perm in Permission.objects.only('id', 'parent_id', 'path')}
+    paths = {}
+
+    for pk in permissions:
+        chain = []
+        node_pk = pk
+        while node_pk is not None and node_pk not in paths and node_pk not in chain:
+            chain.append(node_pk)
+            node_pk = permissions[node_pk].parent_id_id
+        prefix = f'{paths[node_pk]}{node_pk}/' if node_pk is not None and node_pk in paths else '/'
+        for chain_pk in reversed(chain):
+            paths[chain_pk] = prefix
+            prefix = f'{prefix}{chain_pk}/'
+
+    changed = []
+    for pk, permission in permissions.items():
+        if permission.path != paths[pk]:
+            permission.path = paths[pk]
+            changed.append(permission)
+    Permission.objects.bulk_update(changed, ['path'])
+    return len(changed)
+
+
+def build_permission_tree(rows):
+    """
+    将按 path 排序的权限行组装为嵌套树。
+    :param rows: 权限字典列表，需包含 id、parent_id
+    :return: 根节点列表，每个节点带 children
+    """
+    nodes = {row['id']: {**row, 'children': []} for row in rows}
+    tree = []
+    for node in nodes.values():
+        parent = nodes.get(node['parent_id'])
+        if parent is not None:
+            parent['children'].append(node)
+        else:
+            tree.append(node)
+    return tree
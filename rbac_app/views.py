@@ -1,24 +1,83 @@
 # rbac/views.py
-from django.contrib.auth import authenticate, login
+import csv
+import os
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import aauthenticate, alogin
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
-from django.db.models import Q, Count
+from django.db.models import Q, Count, OuterRef, Subquery, JSONField
+from django.db.models.functions import Coalesce, JSONObject
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
 from rest_framework import viewsets, permissions, generics, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
-from self_drf_extensions.views import SearchableListModelMixin
+from DRF_useful_components.pagination import CursorPaginationOptInMixin
+from self_drf_extensions.models import JSONArrayAgg
+from self_drf_extensions.utils import apply_search_lookup
+from self_drf_extensions.views import AsyncAPIView, AsyncViewSet, ConditionalGetMixin, SearchableListModelMixin
 from .models import Role, Permission, UserRole, RolePermission,CustomUser
 from .serializers import RoleSerializer, PermissionSerializer, UserRoleSerializer, RolePermissionSerializer, \
     UserSerializer, CustomUserSerializer
+from .authentication import RbacJWTAuthentication
+from .permissions import RbacPermission, action_codename, crud_codenames
+from .checks import is_cache_process_local
+from .utils import get_effective_permissions, sync_menu_permissions, replace_role_permissions, \
+    build_permission_tree, bump_rbac_version, get_rbac_version, add_rbac_claims, set_user_roles, \
+    aget_rbac_version, aget_effective_permissions, aget_user_role_ids, aget_menu_document, MenuSyncError
+from .tasks import import_users_task
+from .user_export import export_users_csv, export_users_ndjson, aexport_users_csv, aexport_users_ndjson, \
+    EXPORT_FIELDS, EXPORT_CHUNK_SIZE
+from .user_import import import_users, read_rows, detect_format, set_import_progress, get_import_progress, \
+    IMPORT_SYNC_MAX_SIZE
 User = CustomUser
 
+class RbacConditionalGetMixin(ConditionalGetMixin):
+    """
+    以 RBAC 版本号作为 ETag 来源：角色、权限及其关联表的任何写入都会递增版本号，
+    包括删除（Role.updated_at 无法反映删除），未变化时直接返回 304。
+    """
+
+    def get_conditional_version(self, request):
+        return get_rbac_version()
+
+
 class CustomUserViewSet(viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
-    permission_classes=[AllowAny]
+    authentication_classes = [RbacJWTAuthentication]
+    permission_classes = [RbacPermission]
+    rbac_permissions = crud_codenames('user')
+
+def _build_login_response(user, refresh, effective, version):
+    access = refresh.access_token
+
+    # 可选：在访问令牌中写入权限摘要，热点接口无需查询数据库
+    if getattr(settings, 'RBAC_JWT_CLAIMS', False):
+        add_rbac_claims(access, user, effective['role_ids'], version)
+
+    # 格式化权限信息
+    permissions_data = {
+        'role_name': effective['role_names'],
+        'menu': effective['menu']
+    }
+
+    return {
+        'refresh': str(refresh),
+        'accessToken': str(access),
+        'username': user.username,
+        'permissions': permissions_data
+    }
+
 
 #token生成， 登录接口
 def generate_login_response(user):
@@ -28,60 +87,55 @@ def generate_login_response(user):
     # 生成 refresh 和 access 令牌
     refresh = RefreshToken.for_user(user)
 
-    # 获取用户的角色
-    roles = UserRole.objects.filter(user=user).values_list('role', flat=True)
-    # 获取用户的角色名称
-    roles_names = UserRole.objects.filter(user=user).select_related('role').values_list('role__name', flat=True)
+    # 先取版本号再取权限，保证令牌中的版本号不会比权限数据新
+    version = get_rbac_version()
 
-    # 将角色名称转换为列表
-    roles_list = list(roles_names)
+    # 从缓存获取用户的角色与权限：角色组合相同的用户共享同一份菜单数据，
+    # 冷启动时一次查询角色 ID、一次查询角色及其权限
+    effective = get_effective_permissions(user)
 
-    # 获取这些角色对应的权限
-    permissions = RolePermission.objects.filter(role__in=roles).values(
-        'permission__id',
-        'permission__name',
-        'permission__codename',
-        'permission__parent_id',
-        'role__name'  # 添加 parent_id
-    ).distinct()
+    return _build_login_response(user, refresh, effective, version)
 
-    # 格式化权限信息
-    permissions_data = {
-        'role_name': roles_list,
-        'menu': list(permissions)
-    }
 
-    return {
-        'refresh': str(refresh),
-        'accessToken': str(refresh.access_token),
-        'username': user.username,
-        'permissions': permissions_data
-    }
+async def agenerate_login_response(user):
+    """
+    generate_login_response 的异步版本：版本号和权限通过异步缓存、异步 ORM 读取。
+    """
+    # 启用令牌黑名单时签发令牌会写 OutstandingToken 表，需要放到线程中执行
+    if apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+        refresh = await sync_to_async(RefreshToken.for_user)(user)
+    else:
+        refresh = RefreshToken.for_user(user)
 
+    version = await aget_rbac_version()
+    effective = await aget_effective_permissions(user)
 
-class LoginView(APIView):
+    return _build_login_response(user, refresh, effective, version)
+
+
+class LoginView(AsyncAPIView):
     permission_classes = [AllowAny]  # 不需要身份验证
 
-    def post(self, request):
+    async def post(self, request):
         username = request.data.get("username")
         password = request.data.get("password")
-        user = authenticate(username=username, password=password)
+        user = await aauthenticate(username=username, password=password)
 
         if user:
-            login(request, user)  # 这里会自动更新 last_login
+            await alogin(request, user)  # 这里会自动更新 last_login
 
             # 调用提取的函数来生成响应数据
-            response_data = generate_login_response(user)
+            response_data = await agenerate_login_response(user)
 
             return Response(response_data, status=status.HTTP_200_OK)
         else:
             return Response({"error": "Invalid Credentials"}, status=status.HTTP_400_BAD_REQUEST)
 # 用户信息
-class UserInfoView(APIView):
-    authentication_classes = [JWTAuthentication]
+class UserInfoView(AsyncAPIView):
+    authentication_classes = [RbacJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request):
+    async def get(self, request):
         user = request.user
         user_info = {
             'realName':user.name,
@@ -92,110 +146,119 @@ class UserInfoView(APIView):
         return Response(user_info)
 
 # 用户角色的菜单
-class UserMenuView(APIView):
-    authentication_classes = [JWTAuthentication]
+class UserMenuView(AsyncAPIView):
+    authentication_classes = [RbacJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        user = request.user
-
-        # 获取用户的角色
-        roles = UserRole.objects.filter(user=user).values_list('role', flat=True)
-        # 获取用户的角色名称
-        roles_names = UserRole.objects.filter(user=user).select_related('role').values_list('role__name', flat=True)
+    async def get(self, request):
+        # 令牌包含 RBAC 声明时直接使用其中的角色 ID，否则从缓存读取
+        role_ids = getattr(request.user, 'role_ids', None)
+        if role_ids is None:
+            role_ids = await aget_user_role_ids(request.user)
 
-        # 将查询结果转换为列表
-        roles_list = list(roles_names)
-        # 获取这些角色对应的权限
-        permissions = RolePermission.objects.filter(role__in=roles).values(
-            'permission__id',
-            'permission__name',
-            'permission__codename',
-            'permission__parent_id',
-            'role__name'  # 添加 parent_id
-        ).distinct()
+        # 相同角色组合共享同一份预序列化的菜单文档
+        document = await aget_menu_document(role_ids)
+        if document['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            return HttpResponseNotModified(headers={'ETag': document['etag']})
 
-
-        return Response({
-            'roles': roles_list,
-            'menu': list(permissions)
-        })
+        return HttpResponse(document['body'], content_type='application/json', headers={'ETag': document['etag']})
 
 # 更新菜单
 class MenuToPermissionAPIView(APIView):
+    authentication_classes = [RbacJWTAuthentication]
+    permission_classes = [RbacPermission]
+    rbac_permissions = {'post': action_codename('permission', 'sync')}
+
     def post(self, request):
         data = request.data
 
-        # 开启事务
-        with transaction.atomic():
-            # 获取所有现有的权限，存储为字典 {name: Permission}
-            existing_permissions = {perm.name: perm for perm in Permission.objects.all()}
-
-            # 用于存储当前处理过的权限名
-            processed_names = set()
-
-            # 递归保存或更新菜单项为权限
-            def save_or_update_permissions(menu_items, parent_permission=None):
-                for item in menu_items:
-                    name = item['name']  # 用 `name` 作为唯一标识
-                    codename = name  # 假设 `codename` 可以用 `name` 代替
-
-                    # 检查是否已经存在该权限
-                    if name in existing_permissions:
-                        # 权限已存在，跳过创建，但更新其父级并记录
-                        permission = existing_permissions[name]
-                        permission.parent_id = parent_permission
-                        permission.save()
-                        processed_names.add(name)
-                    else:
-                        # 创建新权限
-                        permission = Permission.objects.create(
-                            name=name,
-                            codename=codename,
-                            parent_id=parent_permission
-                        )
-                        # 添加到字典以防后续重复
-                        existing_permissions[name] = permission
-                        processed_names.add(name)
-
-                    # 递归保存或更新子菜单项的权限
-                    children = item.get('children', [])
-                    if children:
-                        save_or_update_permissions(children, parent_permission=permission)
-
-            # 开始处理数据
-            save_or_update_permissions(data)
-
-            # 删除未处理的权限
-            for name, permission in existing_permissions.items():
-                if name not in processed_names:
-                    permission.delete()
-
-        return Response({"detail": "菜单数据已成功更新到权限表"}, status=status.HTTP_200_OK)
+        # 开启事务，按差异批量同步菜单到权限表
+        try:
+            with transaction.atomic():
+                summary = sync_menu_permissions(data)
+        except MenuSyncError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"detail": "菜单数据已成功更新到权限表", **summary}, status=status.HTTP_200_OK)
 
 # 用户角色
-class RoleViewSet(SearchableListModelMixin):
+class RoleViewSet(RbacConditionalGetMixin, SearchableListModelMixin):
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
+    authentication_classes = [RbacJWTAuthentication]
+    permission_classes = [RbacPermission]
+    rbac_permissions = crud_codenames('role')
     time_range_fields = ['created_at', 'updated_at']
 
-class PermissionViewSet(viewsets.ModelViewSet):
+    def with_permission_ids(self):
+        return self.request.query_params.get('withPermissionIds') in ('1', 'true')
+
+    def get_queryset(self):
+        """
+        在同一条查询中注解权限数、用户数（相关子查询，避免两个一对多 JOIN 相乘），
+        传入 withPermissionIds=true 时同时聚合权限 ID 列表，角色管理页一次请求即可加载。
+        """
+        permission_count = RolePermission.objects.filter(role=OuterRef('pk')).values('role') \
+            .annotate(count=Count('*')).values('count')
+        user_count = UserRole.objects.filter(role=OuterRef('pk')).values('role') \
+            .annotate(count=Count('*')).values('count')
+        queryset = super().get_queryset().annotate(
+            permission_count=Coalesce(Subquery(permission_count), 0),
+            user_count=Coalesce(Subquery(user_count), 0),
+        )
+        if self.with_permission_ids():
+            permission_ids = RolePermission.objects.filter(role=OuterRef('pk')).values('role') \
+                .annotate(ids=JSONArrayAgg('permission_id')).values('ids')
+            queryset = queryset.annotate(permission_ids=Subquery(permission_ids, output_field=JSONField()))
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['with_permission_ids'] = self.with_permission_ids()
+        return context
+
+class PermissionViewSet(RbacConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Permission.objects.all()
     serializer_class = PermissionSerializer
     pagination_class = None  # 禁用分页器
-    # permission_classes = [permissions.IsAdminUser]
+    conditional_actions = ('list', 'retrieve', 'tree')
+    authentication_classes = [RbacJWTAuthentication]
+    permission_classes = [RbacPermission]
+    rbac_permissions = crud_codenames('permission', tree='view')
+
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """
+        返回服务端组装好的权限树；传入 root 时只返回该节点的子树。
+        子树通过 path 前缀一次索引查询取出。
+        """
+        queryset = Permission.objects.all()
+        root_id = request.query_params.get('root')
+        if root_id:
+            try:
+                root = Permission.objects.get(pk=root_id)
+            except (Permission.DoesNotExist, ValueError):
+                return Response({"detail": "Permission not found."}, status=status.HTTP_404_NOT_FOUND)
+            queryset = root.get_descendants(include_self=True)
+
+        rows = queryset.order_by('path', 'id').values('id', 'name', 'codename', 'parent_id', 'path')
+        return Response(build_permission_tree(list(rows)))
 
 class UserRoleViewSet(viewsets.ModelViewSet):
     queryset = UserRole.objects.all()
     serializer_class = UserRoleSerializer
-    # permission_classes = [permissions.IsAdminUser]
+    authentication_classes = [RbacJWTAuthentication]
+    permission_classes = [RbacPermission]
+    rbac_permissions = crud_codenames('user_role')
 
 # 获取角色对应菜单
-class RolePermissionViewSet(viewsets.ModelViewSet):
+class RolePermissionViewSet(RbacConditionalGetMixin, viewsets.ModelViewSet):
     queryset = RolePermission.objects.all()
     serializer_class = RolePermissionSerializer
     pagination_class = None  # 禁用分页器
-    # permission_classes = [permissions.IsAdminUser]
+    authentication_classes = [RbacJWTAuthentication]
+    permission_classes = [RbacPermission]
+    rbac_permissions = crud_codenames('role_permission', grant_subtree='change', batch_update='change')
 
     def create(self, request, *args, **kwargs):
         role_id = request.data.get('role')
@@ -253,6 +316,48 @@ class RolePermissionViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(detail=False, methods=['post'], url_path='grant-subtree')
+    def grant_subtree(self, request, *args, **kwargs):
+        """
+        将某个权限及其全部子孙权限授予角色。
+        请求示例：{"role": 1, "permission": 5}
+        """
+        role_id = request.data.get('role')
+        permission_id = request.data.get('permission')
+
+        if not role_id or not permission_id:
+            return Response(
+                {"detail": "Role and permission are required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            role = Role.objects.get(id=role_id)
+            permission = Permission.objects.get(id=permission_id)
+        except (Role.DoesNotExist, Permission.DoesNotExist):
+            return Response(
+                {"detail": "Role or permission not found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # 子树通过 path 前缀一次索引查询取出，并排除角色已有的权限，只插入新增部分；
+        # ignore_conflicts 只用于兜底并发授予，返回的对象数不代表实际插入行数，不能用来计数
+        granted = RolePermission.objects.filter(role=role).values('permission_id')
+        new_ids = list(
+            permission.get_descendants(include_self=True).exclude(id__in=granted).values_list('id', flat=True)
+        )
+        if new_ids:
+            RolePermission.objects.bulk_create(
+                [RolePermission(role=role, permission_id=pk) for pk in new_ids],
+                ignore_conflicts=True
+            )
+            bump_rbac_version()
+
+        return Response(
+            {"detail": "Permission subtree successfully added to role.", "count": len(new_ids)},
+            status=status.HTTP_201_CREATED
+        )
+
     # 重写 retrieve 方法 获取角色的菜单
     def retrieve(self, request, pk=None, *args, **kwargs):
         # pk 实际上是 roles 的 id
@@ -288,44 +393,88 @@ class RolePermissionViewSet(viewsets.ModelViewSet):
             )
 
         # 处理提供的权限列表
-        permission_ids = [perm.get('id') for perm in permissions]  # 提取权限 ID 列表
+        permission_ids = {perm.get('id') for perm in permissions}  # 提取权限 ID 集合
 
-        # 验证权限是否存在
-        valid_permissions = Permission.objects.filter(id__in=permission_ids)
-
-        # 如果有无效的权限 ID，返回 400 错误
-        if valid_permissions.count() != len(permission_ids):
+        # 验证权限是否存在，如果有无效的权限 ID，返回 400 错误
+        if Permission.objects.filter(id__in=permission_ids).count() != len(permission_ids):
             return Response(
                 {"detail": "一个或多个权限无效。"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 在添加新权限之前，删除角色当前关联的所有权限
-        RolePermission.objects.filter(role=role).delete()
-
-        # 为角色创建新的权限关联
-        for permission in valid_permissions:
-            RolePermission.objects.create(role=role, permission=permission)
+        # 与当前权限比对，原子地新增缺少的、删除多余的权限
+        summary = replace_role_permissions({role.id: permission_ids})
 
         return Response(
-            {"detail": "角色的权限已成功更新。"},
+            {"detail": "角色的权限已成功更新。", **summary},
             status=status.HTTP_200_OK
         )
 
-class UserPermissionsViewSet(viewsets.ViewSet):
-    permission_classes = [permissions.IsAuthenticated]  # Only authenticated users can access
+    @action(detail=False, methods=['put'], url_path='batch')
+    def batch_update(self, request, *args, **kwargs):
+        """
+        批量更新多个角色的权限，所有角色在同一事务中完成替换。
+        请求示例：
+        {
+            "roles": [
+                {"role_id": 1, "permissions": [{"id": 1}, {"id": 2}]},
+                {"role_id": 2, "permissions": [{"id": 3}]}
+            ]
+        }
+        """
+        roles_data = request.data.get('roles', [])
 
-    def list(self, request):
-        user = request.user
-        # 获取用户的所有角色
-        roles = UserRole.objects.filter(user=user).values_list('role', flat=True)
+        if not roles_data:
+            return Response(
+                {"detail": "至少需要一个角色。"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # 获取这些角色对应的所有权限
-        permissions = RolePermission.objects.filter(role__in=roles).values(
-            'permission__id', 'permission__name', 'permission__codename'
-        ).distinct()
+        role_permissions = {}
+        for role_data in roles_data:
+            role_id = role_data.get('role_id')
+            permissions = role_data.get('permissions', [])
+            if not role_id:
+                return Response(
+                    {"detail": "角色是必需的。"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not permissions:
+                return Response(
+                    {"detail": "至少需要一个权限。"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            role_permissions[role_id] = {perm.get('id') for perm in permissions}
 
-        return Response(list(permissions))
+        # 一次查询验证所有角色存在
+        if Role.objects.filter(id__in=role_permissions).count() != len(role_permissions):
+            return Response(
+                {"detail": "角色未找到。"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # 一次查询验证所有权限存在
+        permission_ids = set().union(*role_permissions.values())
+        if Permission.objects.filter(id__in=permission_ids).count() != len(permission_ids):
+            return Response(
+                {"detail": "一个或多个权限无效。"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        summary = replace_role_permissions(role_permissions)
+
+        return Response(
+            {"detail": "角色的权限已成功更新。", **summary},
+            status=status.HTTP_200_OK
+        )
+
+class UserPermissionsViewSet(AsyncViewSet):
+    permission_classes = [permissions.IsAuthenticated]  # Only authenticated users can access
+
+    async def list(self, request):
+        # 从缓存获取用户的所有权限（已按权限去重）
+        effective = await aget_effective_permissions(request.user)
+        return Response(effective['permissions'])
 
 # 用户权限视图集--前端 用户管理页面
 class AllUsersPermissionsViewSet(viewsets.ModelViewSet):
@@ -335,7 +484,7 @@ class AllUsersPermissionsViewSet(viewsets.ModelViewSet):
     这是一个 Django ViewSet，用于处理用户的权限相关操作。
 
     属性:
-        permission_classes: 设置视图的权限类（在此设置为允许所有用户访问）
+        permission_classes: 设置视图的权限类（RbacPermission，按 rbac_permissions 中声明的 codename 校验）
         queryset: 定义视图查询的用户集合
         serializer_class: 指定用户的序列化类
 
@@ -344,11 +493,39 @@ class AllUsersPermissionsViewSet(viewsets.ModelViewSet):
         update: 更新指定用户的信息和角色
         create: 创建用户并分配角色
     """
-    permission_classes = [AllowAny]
+    authentication_classes = [RbacJWTAuthentication]
+    permission_classes = [RbacPermission]
+    rbac_permissions = crud_codenames('user', export='export', bulk_import='import',
+                                      bulk_import_status='import')
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
+    # 字段搜索策略，与 CustomUser 上的索引对应；未声明的字段使用 icontains
+    search_lookups = {
+        'username': 'trigram',
+        'name': 'trigram',
+        'email': 'istartswith',
+        'phone_number': 'prefix',
+    }
 
     def list(self, request, *args, **kwargs):
+        users = self.filter_users()
+
+        # 分页
+        page = self.paginate_queryset(users)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            serialized_data = self.attach_roles(serializer.data)
+            return self.get_paginated_response(serialized_data)
+
+        # 直接序列化整个查询集
+        serializer = self.get_serializer(users, many=True)
+        serialized_data = self.attach_roles(serializer.data)
+        return Response(serialized_data)
+
+    def filter_users(self):
+        """
+        根据查询参数构建用户查询集，list 和 export 共用同一套过滤规则。
+        """
         # 获取默认序列化器的字段
         serializer_fields = set(self.get_serializer().fields.keys())
 
@@ -380,6 +557,7 @@ class AllUsersPermissionsViewSet(viewsets.ModelViewSet):
                 query.add(Q(date_joined__range=(start_date, end_date)), Q.AND)
 
         # 处理其他查询参数
+        search_terms = []
         for field, value in query_params.items():
             # 检查字段是否在序列化器字段集合中
             if field in all_fields and value:
@@ -388,36 +566,71 @@ class AllUsersPermissionsViewSet(viewsets.ModelViewSet):
                     bool_value = value.lower() == 'true'
                     query.add(Q(**{f'{field}': bool_value}), Q.AND)
                 elif field not in ['last_login[]', 'date_joined[]']:  # 跳过已处理的字段
-                    query.add(Q(**{f'{field}__icontains': value}), Q.AND)
+                    search_terms.append((field, value))
 
         # 如果提供了 role_ids，过滤拥有指定角色的用户；否则返回所有用户
         users = self.get_queryset().filter(query)
+        # 按字段声明的搜索策略过滤
+        for field, value in search_terms:
+            users = apply_search_lookup(users, field, value, self.search_lookups.get(field, 'icontains'))
         if role_ids:
             users = users.filter(user_roles__role_id__in=role_ids) \
                 .annotate(matching_roles=Count('user_roles__role_id', filter=Q(user_roles__role_id__in=role_ids))) \
                 .filter(matching_roles=len(role_ids))  # 确保匹配角色数等于传入的角色 ID 数量
+        return users
+
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        """
+        流式导出用户及其角色，过滤参数与 list 相同。
+        exportFormat=csv（默认）或 ndjson。
+        角色通过相关子查询在同一条 SQL 中聚合，用户通过服务端游标分块读取，内存占用与导出行数无关。
+        ASGI 下使用 aiterator() 和异步生成器，否则 Django 会先把同步迭代器整体读入内存再发送。
+        """
+        export_format = request.query_params.get('exportFormat', 'csv')
+        if export_format not in ('csv', 'ndjson'):
+            return Response({"detail": "Unsupported export format."}, status=status.HTTP_400_BAD_REQUEST)
+
+        roles_subquery = UserRole.objects.filter(user=OuterRef('pk')).values('user').annotate(
+            roles_json=JSONArrayAgg(JSONObject(id='role_id', name='role__name'))
+        ).values('roles_json')
+        queryset = self.filter_users().order_by('id').annotate(
+            roles_json=Subquery(roles_subquery, output_field=JSONField())
+        ).values(*EXPORT_FIELDS, 'roles_json')
+
+        if isinstance(request._request, ASGIRequest):
+            rows = queryset.aiterator(chunk_size=EXPORT_CHUNK_SIZE)
+            export_csv, export_ndjson = aexport_users_csv, aexport_users_ndjson
+        else:
+            rows = queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            export_csv, export_ndjson = export_users_csv, export_users_ndjson
 
-        # 分页
-        page = self.paginate_queryset(users)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            serialized_data = serializer.data
-            # 获取角色 ID 和 name，并将其作为对象添加到用户数据中
-            for user_data in serialized_data:
-                roles = UserRole.objects.filter(user=user_data['id']).select_related('role').values('role__id',
-                                                                                                    'role__name')
-                user_data['roles'] = [{"id": role['role__id'], "name": role['role__name']} for role in roles]
-            return self.get_paginated_response(serialized_data)
+        if export_format == 'ndjson':
+            content, content_type = export_ndjson(rows), 'application/x-ndjson'
+        else:
+            content, content_type = export_csv(rows), 'text/csv; charset=utf-8'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="users.{export_format}"'
+        return response
+
+    @staticmethod
+    def attach_roles(serialized_data):
+        """
+        将角色 ID 和 name 作为对象添加到用户数据中。
+        所有用户的角色通过一次查询取出并按用户 ID 分组，查询次数与分页大小无关。
+        """
+        user_ids = [user_data['id'] for user_data in serialized_data]
+        roles_by_user = {user_id: [] for user_id in user_ids}
+        role_rows = UserRole.objects.filter(user_id__in=user_ids).values_list('user_id', 'role__id', 'role__name')
+        for user_id, role_id, role_name in role_rows:
+            roles_by_user[user_id].append({"id": role_id, "name": role_name})
 
-        # 直接序列化整个查询集
-        serializer = self.get_serializer(users, many=True)
-        serialized_data = serializer.data
-        # 获取角色 ID 和 name，并将其作为对象添加到用户数据中
         for user_data in serialized_data:
-            roles = UserRole.objects.filter(user=user_data['id']).select_related('role').values('role__id',
-                                                                                                'role__name')
-            user_data['roles'] = [{"id": role['role__id'], "name": role['role__name']} for role in roles]
-        return Response(serialized_data)
+            user_data['roles'] = roles_by_user[user_data['id']]
+        return serialized_data
+
+    @transaction.atomic
     def update(self, request, pk=None, *args, **kwargs):
         # 获取当前用户对象
         user = self.get_object()
@@ -430,57 +643,87 @@ class AllUsersPermissionsViewSet(viewsets.ModelViewSet):
         # 更新用户的其他信息（由序列化器处理）
         updated_user = serializer.save()
 
-        # 获取用户传入的角色数据
+        # 获取用户传入的角色数据，与当前角色比对后批量增删
         roles_data = request.data.get('roles', [])
-
-        # 获取当前用户的所有角色ID集合
-        current_role_ids = UserRole.objects.filter(user=user).values_list('role_id', flat=True)
-
-        # 获取所有可用的角色ID集合（基于提供的角色ID列表）
-        available_roles = Role.objects.filter(id__in=roles_data).values_list('id', flat=True)
-
-        # 构建要设置的角色ID集合
-        roles_to_set = set(available_roles)
-
-        # 找出要删除的角色ID（当前角色ID中不在新角色ID列表中的）
-        roles_to_remove = set(current_role_ids) - roles_to_set
-
-        # 删除不再需要的角色关联
-        UserRole.objects.filter(user=user, role_id__in=roles_to_remove).delete()
-
-        # 添加新的角色关联（确保不会重复添加）
-        for role_id in roles_to_set:
-            # 检查是否已经存在该用户和角色的关联
-            if not UserRole.objects.filter(user=user, role_id=role_id).exists():
-                UserRole.objects.create(user=user, role_id=role_id)
+        set_user_roles(updated_user, roles_data)
 
         # 返回更新成功的响应
         return Response({"status": "success", "detail": "User and roles updated successfully."},
                         status=status.HTTP_200_OK)
 
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         # 创建用户
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
 
-        # 分配角色
+        # 分配角色（忽略不存在的角色 ID），批量插入
         roles_data = request.data.get('roles', [])
-
-        # 查找并分配对应角色ID的角色
-        available_roles = Role.objects.filter(id__in=roles_data)
-
-        # 遍历角色并创建关联
-        for role in available_roles:
-            UserRole.objects.create(user=user, role=role)
+        set_user_roles(user, roles_data)
 
         return Response({"status": "success", "detail": "User created and roles assigned successfully."},
                         status=status.HTTP_201_CREATED)
 
-class UserManagementViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def bulk_import(self, request, *args, **kwargs):
+        """
+        批量导入用户，支持 CSV 和 JSON Lines（按扩展名或 fileFormat 参数识别）。
+        - CSV 表头：username,password,name,email,phone_number,address,is_active,roles（角色 ID 以分号分隔）
+        - JSON Lines：每行一个用户对象，roles 为角色 ID 列表
+        校验规则与创建用户一致。小文件在请求中同步导入并直接返回报告；
+        文件较大或传入 async=true 时交给 Celery 异步导入，返回 importId 用于查询进度。
+        """
+        uploaded_file = request.FILES.get('file')
+        if not uploaded_file:
+            return Response({"detail": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('fileFormat') or detect_format(uploaded_file.name)
+        if file_format not in ('csv', 'jsonl'):
+            return Response({"detail": "Unsupported file format."}, status=status.HTTP_400_BAD_REQUEST)
+
+        run_async = str(request.data.get('async', '')).lower() == 'true' or uploaded_file.size > IMPORT_SYNC_MAX_SIZE
+        if is_cache_process_local():
+            # 进度写在 Celery worker 进程的本地缓存中，Web 进程永远查不到，只能同步导入
+            run_async = False
+        if not run_async:
+            try:
+                report = import_users(read_rows(uploaded_file, file_format), hash_workers=1)
+            except (ValueError, UnicodeDecodeError, csv.Error) as e:
+                return Response({"detail": f"Invalid file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(report, status=status.HTTP_200_OK)
+
+        # 异步导入：先把上传文件按块写入磁盘，再交给 Celery 处理
+        import_id = uuid.uuid4().hex
+        import_dir = os.path.join(settings.MEDIA_ROOT, 'imports')
+        os.makedirs(import_dir, exist_ok=True)
+        file_path = os.path.join(import_dir, f'{import_id}.{file_format}')
+        with open(file_path, 'wb') as f:
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
+
+        set_import_progress(import_id, 'pending')
+        import_users_task.delay(import_id, file_path, file_format)
+
+        return Response({"importId": import_id, "status": "pending"}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'import/(?P<import_id>[0-9a-f]{32})')
+    def bulk_import_status(self, request, import_id=None, *args, **kwargs):
+        """
+        查询异步导入的进度和报告。
+        """
+        progress = get_import_progress(import_id)
+        if progress is None:
+            return Response({"detail": "Import not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"importId": import_id, **progress}, status=status.HTTP_200_OK)
+
+class UserManagementViewSet(CursorPaginationOptInMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    # permission_classes = [permissions.IsAdminUser]  # Only admin users can access
+    # 默认页码分页；用户表较大时可传 paginate=cursor 使用游标分页，翻页不执行 COUNT(*) 和 OFFSET
+    authentication_classes = [RbacJWTAuthentication]
+    permission_classes = [RbacPermission]
+    rbac_permissions = crud_codenames('user')
 
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
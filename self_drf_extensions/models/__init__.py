@@ -1,3 +1,4 @@
+from .aggregates import JSONArrayAgg
 from .base import BaseModel
 
-__all__ = ["BaseModel"]
+__all__ = ["BaseModel", "JSONArrayAgg"]
@@ -0,0 +1,17 @@
+from django.db.models import Aggregate, JSONField
+
+
+class JSONArrayAgg(Aggregate):
+    """
+    将分组内的值聚合为 JSON 数组，兼容 PostgreSQL、SQLite 和 MySQL。
+    常与 JSONObject 配合，在一条查询中把关联表的多行聚合到主表的一行上：
+        JSONArrayAgg(JSONObject(id='role_id', name='role__name'))
+    """
+    function = 'JSON_GROUP_ARRAY'
+    output_field = JSONField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function='JSON_AGG', **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function='JSON_ARRAYAGG', **extra_context)
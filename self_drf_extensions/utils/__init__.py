@@ -1,3 +1,4 @@
 from .responses import custom_response
+from .search import apply_search_lookup, SEARCH_LOOKUPS
 
-__all__ = ["custom_response"]
+__all__ = ["custom_response", "apply_search_lookup", "SEARCH_LOOKUPS"]
@@ -0,0 +1,41 @@
+from django.db import connections
+
+# 搜索策略 -> ORM 查询方式
+# trigram 仍使用 icontains，在 PostgreSQL 上由 UPPER(col) 的 gin_trgm_ops 索引支持，
+# 结果与原来的模糊查询一致，但不再是全表扫描。
+SEARCH_LOOKUPS = {
+    'exact': 'exact',
+    'iexact': 'iexact',
+    'prefix': 'startswith',
+    'istartswith': 'istartswith',
+    'icontains': 'icontains',
+    'trigram': 'icontains',
+}
+
+# 全文检索使用的文本搜索配置，需与全文索引的配置一致
+FULL_TEXT_SEARCH_CONFIG = 'simple'
+
+
+def apply_search_lookup(queryset, field, value, strategy='icontains'):
+    """
+    按指定的搜索策略过滤查询集。
+    :param queryset: 查询集
+    :param field: 字段名
+    :param value: 查询值
+    :param strategy: 搜索策略，可选 exact、iexact、prefix、istartswith、icontains、trigram、search（全文检索）
+    :return: 过滤后的查询集
+    """
+    if strategy == 'search':
+        if connections[queryset.db].vendor == 'postgresql':
+            from django.contrib.postgres.search import SearchQuery, SearchVector
+
+            alias = f'{field}_search_vector'
+            return queryset.alias(**{alias: SearchVector(field, config=FULL_TEXT_SEARCH_CONFIG)}).filter(
+                **{alias: SearchQuery(value, config=FULL_TEXT_SEARCH_CONFIG)}
+            )
+        # 非 PostgreSQL 数据库退化为模糊查询
+        strategy = 'icontains'
+
+    if strategy not in SEARCH_LOOKUPS:
+        raise ValueError(f"Unknown search strategy '{strategy}' for field '{field}'")
+    return queryset.filter(**{f'{field}__{SEARCH_LOOKUPS[strategy]}': value})
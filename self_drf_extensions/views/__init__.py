@@ -1,3 +1,4 @@
-from .mixins import SearchableListModelMixin
+from .async_views import AsyncAPIView, AsyncAPIViewMixin, AsyncViewSet
+from .mixins import ConditionalGetMixin, SearchableListModelMixin
 
-__all__ = ["SearchableListModelMixin"]
+__all__ = ["AsyncAPIView", "AsyncAPIViewMixin", "AsyncViewSet", "ConditionalGetMixin", "SearchableListModelMixin"]
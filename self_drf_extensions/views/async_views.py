@@ -0,0 +1,118 @@
+import inspect
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import exceptions, viewsets
+from rest_framework.views import APIView
+
+
+class AsyncAPIViewMixin:
+    """
+    DRF 视图的异步 dispatch，在 ASGI 下直接运行于事件循环，不占用线程。
+    - 处理方法（get / list 等）写成 async def；
+    - 认证类实现 aauthenticate(request) 时直接 await，否则通过 sync_to_async 调用；
+    - 权限类实现 ahas_permission(request, view) 时直接 await，否则通过 sync_to_async 调用（同步权限类可能访问数据库）；
+    - 响应在 dispatch 内渲染为普通 HttpResponse，Django 不再通过线程池调用 render()。
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.render_response(self.response)
+
+    async def ainitial(self, request, *args, **kwargs):
+        """
+        与 APIView.initial 相同的步骤，认证和权限校验为异步。
+        """
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        await self.acheck_permissions(request)
+        self.check_throttles(request)
+
+    async def aperform_authentication(self, request):
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None) \
+                or sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+    async def acheck_permissions(self, request):
+        for permission in self.get_permissions():
+            has_permission = getattr(permission, 'ahas_permission', None) \
+                or sync_to_async(permission.has_permission)
+            allowed = await has_permission(request, self)
+            if not allowed:
+                self.permission_denied(
+                    request,
+                    message=getattr(permission, 'message', None),
+                    code=getattr(permission, 'code', None)
+                )
+
+    def render_response(self, response):
+        if not hasattr(response, 'render'):
+            return response
+        response.render()
+        rendered = HttpResponse(response.content, status=response.status_code, headers=response.headers)
+        rendered.cookies = response.cookies
+        # 保留 data，便于测试中读取
+        rendered.data = getattr(response, 'data', None)
+        return rendered
+
+
+class AsyncAPIView(AsyncAPIViewMixin, APIView):
+    pass
+
+
+class AsyncViewSet(AsyncAPIViewMixin, viewsets.ViewSet):
+    """
+    异步 ViewSet：action 方法写成 async def。
+    ViewSetMixin.as_view 生成的是同步函数，这里包一层 async 函数，让 Django 按异步视图调用。
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        update_wrapper(async_view, view)
+        return async_view
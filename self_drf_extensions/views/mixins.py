@@ -1,21 +1,31 @@
+import hashlib
+
 from rest_framework import status, viewsets
 from rest_framework.response import Response
 from django.db.models import Q
+from django.utils.cache import get_conditional_response
 from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from django.utils.timezone import make_aware
 
+from ..utils.search import apply_search_lookup
+
 class SearchableListModelMixin(viewsets.ModelViewSet):
     time_range_fields = []
+    # 每个字段的搜索策略，如 {'name': 'istartswith', 'code': 'exact'}；
+    # 未声明的字段默认使用 icontains 模糊查询，可选策略见 self_drf_extensions.utils.search
+    search_lookups = {}
 
     def list(self, request, *args, **kwargs):
         query_params = request.query_params
         serializer_fields = set(self.get_serializer().fields.keys())
         query = Q()
+        search_terms = []
 
-        # 普通字段模糊查询（排除时间范围字段）
+        # 普通字段按搜索策略查询（排除时间范围字段）
         for field, value in query_params.items():
             if field in serializer_fields and field not in self.time_range_fields and value:
-                query.add(Q(**{f'{field}__icontains': value}), Q.AND)
+                search_terms.append((field, value))
 
         # 时间范围查询
         for time_field in self.time_range_fields:
@@ -29,7 +39,10 @@ class SearchableListModelMixin(viewsets.ModelViewSet):
                     query.add(Q(**{f'{time_field}__range': (start_date, end_date)}), Q.AND)
 
         # 查询和排序
-        queryset = self.get_queryset().filter(query).order_by('id')
+        queryset = self.get_queryset().filter(query)
+        for field, value in search_terms:
+            queryset = apply_search_lookup(queryset, field, value, self.search_lookups.get(field, 'icontains'))
+        queryset = queryset.order_by('id')
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -37,3 +50,70 @@ class SearchableListModelMixin(viewsets.ModelViewSet):
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class _PreconditionResponse(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+class ConditionalGetMixin:
+    """
+    条件 GET 支持（ETag / Last-Modified）。
+    在认证、权限校验之后、执行查询之前比较 If-None-Match / If-Modified-Since，
+    资源未变化时直接返回 304，不会执行 queryset 和序列化。
+    子类实现 get_conditional_version()（版本号、计数器等，变化即视为资源变化）
+    和/或 get_last_modified()（datetime），返回 None 表示不启用对应校验。
+    需放在视图基类之前，例如 class RoleViewSet(ConditionalGetMixin, viewsets.ModelViewSet)。
+    """
+    # 启用条件 GET 的 action；APIView 使用小写的请求方法名（如 'get'）
+    conditional_actions = ('list', 'retrieve')
+
+    def get_conditional_version(self, request):
+        return None
+
+    def get_last_modified(self, request):
+        return None
+
+    def get_etag(self, request):
+        """
+        ETag 由版本号和完整请求路径（含查询参数）计算，不同过滤/分页参数的响应互不影响。
+        """
+        version = self.get_conditional_version(request)
+        if version is None:
+            return None
+        source = f'{version}:{request.get_full_path()}:{request.accepted_media_type}'
+        return f'"{hashlib.md5(source.encode()).hexdigest()}"'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_headers = {}
+        action = getattr(self, 'action', None) or request.method.lower()
+        if request.method not in ('GET', 'HEAD') or action not in self.conditional_actions:
+            return
+
+        etag = self.get_etag(request)
+        last_modified = self.get_last_modified(request)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        if etag:
+            self.conditional_headers['ETag'] = etag
+        if timestamp is not None:
+            self.conditional_headers['Last-Modified'] = http_date(timestamp)
+
+        # 未变化时为 304，If-Match 等前置条件不满足时为 412
+        conditional_response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if conditional_response is not None:
+            raise _PreconditionResponse(conditional_response.status_code)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _PreconditionResponse):
+            return Response(status=exc.status_code, headers=self.conditional_headers)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            for header, value in getattr(self, 'conditional_headers', {}).items():
+                response.setdefault(header, value)
+        return response
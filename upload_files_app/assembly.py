@@ -0,0 +1,134 @@
+# upload_files_app/assembly.py
+# ==========================
+# Preallocated Chunk Assembly / 预分配单文件分片组装
+# ==========================
+# settings.UPLOAD_ASSEMBLY_MODE = 'preallocate' 时使用：
+# 第一个到达的分片按 fileSize 预分配目标文件（posix_fallocate，不支持时 ftruncate），
+# 每个分片用 os.pwrite 直接写到 chunkIndex * chunkSize 偏移处，不再生成 chunk_<i> 临时文件；
+# 已接收的分片记录在上传会话（UploadSession）的位图中，合并时只需要一次重命名，不再复制数据。
+
+import hashlib
+import math
+import os
+
+from django.conf import settings
+
+ASSEMBLY_MODE_CHUNKS = 'chunks'
+ASSEMBLY_MODE_PREALLOCATE = 'preallocate'
+# 完成时校验哈希的读取缓冲区大小
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+def get_assembly_mode():
+    return getattr(settings, 'UPLOAD_ASSEMBLY_MODE', ASSEMBLY_MODE_CHUNKS)
+
+
+class ChunkBitmap:
+    """
+    已接收分片的位图，第 i 位表示第 i 个分片已写入。
+    """
+
+    def __init__(self, total_chunks, data=b''):
+        self.total_chunks = total_chunks
+        size = (total_chunks + 7) // 8
+        self.bits = bytearray(data[:size].ljust(size, b'\0'))
+
+    def add(self, index):
+        self.bits[index >> 3] |= 1 << (index & 7)
+
+    def __contains__(self, index):
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def count(self):
+        return int.from_bytes(self.bits, 'little').bit_count()
+
+    def is_complete(self):
+        return self.count() == self.total_chunks
+
+    def received(self):
+        return [index for index in range(self.total_chunks) if index in self]
+
+    def missing(self):
+        return [index for index in range(self.total_chunks) if index not in self]
+
+    def to_bytes(self):
+        return bytes(self.bits)
+
+
+def chunk_layout(file_size, chunk_size):
+    """
+    :return: 分片总数
+    :raises ValueError: 参数不是正整数
+    """
+    file_size, chunk_size = int(file_size), int(chunk_size)
+    if file_size <= 0 or chunk_size <= 0:
+        raise ValueError('fileSize and chunkSize must be positive')
+    return math.ceil(file_size / chunk_size)
+
+
+def expected_chunk_length(index, file_size, chunk_size):
+    return min(chunk_size, file_size - index * chunk_size)
+
+
+def assembly_path(file_hash):
+    """
+    :return: 组装中的数据文件路径
+    """
+    return os.path.join(settings.MEDIA_ROOT, 'temp', f'{file_hash}.part')
+
+
+def preallocate(path, file_size):
+    """
+    创建并预分配目标文件；文件已存在且大小一致时不做任何操作（并发的第一个分片都可以安全调用）。
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.fstat(fd).st_size != file_size:
+            try:
+                os.posix_fallocate(fd, 0, file_size)
+            except (AttributeError, OSError):
+                # 不支持 fallocate 的平台/文件系统退化为稀疏文件
+                os.ftruncate(fd, file_size)
+    finally:
+        os.close(fd)
+
+
+def write_chunk_at(path, offset, uploaded_file):
+    """
+    将分片逐块 pwrite 到目标文件的 offset 处。
+    没有 os.pwrite 的平台（Windows）使用 lseek + write，文件描述由本次请求独占，效果相同。
+    :return: 写入的字节数
+    """
+    written = 0
+    fd = os.open(path, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        if not hasattr(os, 'pwrite'):
+            os.lseek(fd, offset, os.SEEK_SET)
+        for block in uploaded_file.chunks():
+            view = memoryview(block)
+            while view:
+                if hasattr(os, 'pwrite'):
+                    count = os.pwrite(fd, view, offset + written)
+                else:
+                    count = os.write(fd, view)
+                written += count
+                view = view[count:]
+    finally:
+        os.close(fd)
+    return written
+
+
+def hash_file(path):
+    """
+    分片乱序写入无法增量计算哈希，完成时顺序读取一次（只读不复制）。
+    """
+    hasher = hashlib.sha256()
+    buffer = memoryview(bytearray(HASH_BUFFER_SIZE))
+    with open(path, 'rb') as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            hasher.update(buffer[:count])
+    return hasher.hexdigest()
@@ -0,0 +1,20 @@
+# upload_files_app/management/commands/clean_upload_sessions.py
+# 清理过期的分片上传会话及其临时数据（分片目录、预分配文件），可由定时任务定期执行。
+# 用法：python manage.py clean_upload_sessions
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from upload_files_app.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = '删除过期的分片上传会话及其临时文件'
+
+    def handle(self, *args, **options):
+        removed = 0
+        for session in UploadSession.objects.filter(expires_at__lte=timezone.now()).iterator():
+            with UploadSession.session_lock(session.file_hash, exclusive=True):
+                session.discard()
+            removed += 1
+        self.stdout.write(f'Removed {removed} expired upload sessions')
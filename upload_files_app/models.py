@@ -1,6 +1,15 @@
-from django.db import models
+import os
+import shutil
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
 import hashlib
 
+from .assembly import ChunkBitmap, assembly_path
+from .utils import file_lock
+
 class File(models.Model):
     file_name = models.CharField(max_length=255)  # 文件原始名称
     file_path = models.FileField(upload_to='uploads/files/')  # 文件存储路径，使用 FileField 来处理
@@ -10,16 +19,21 @@ class File(models.Model):
         return self.file_name
 
     @classmethod
-    def create_file_record(cls, uploaded_file, file_path):
+    def create_file_record(cls, uploaded_file, file_path, file_hash=None):
         """
         根据文件哈希值创建或返回文件记录
         :param uploaded_file: 上传的文件对象
         :param file_path: 文件的存储路径
+        :param file_hash: 已计算好的哈希值；未提供时逐块读取文件计算
         :return: 文件记录对象
         """
         # 计算文件的哈希值
-        uploaded_file.seek(0)  # 重新将文件指针移动到开头，准备下一步操作
-        file_hash = hashlib.sha256(uploaded_file.read()).hexdigest()
+        if file_hash is None:
+            uploaded_file.seek(0)  # 重新将文件指针移动到开头，准备下一步操作
+            hasher = hashlib.sha256()
+            for chunk in uploaded_file.chunks():
+                hasher.update(chunk)
+            file_hash = hasher.hexdigest()
 
         # 查找是否已存在该文件
         file_record, created = cls.objects.get_or_create(
@@ -33,3 +47,133 @@ class File(models.Model):
 
         # 如果是新文件，则返回新的记录
         return file_record
+
+
+class UploadSessionMismatch(ValueError):
+    """
+    同一个 fileHash 的会话已存在，但分片总数或分片大小与本次请求不一致。
+    """
+
+
+def get_upload_session_ttl():
+    return getattr(settings, 'UPLOAD_SESSION_TTL', timedelta(days=1))
+
+
+class UploadSession(models.Model):
+    """
+    分片上传会话，每个 fileHash 一行：记录分片总数、分片大小和已接收分片位图（每个分片 1 bit）。
+    查询断点只读取这一行，不再列举临时目录；过期的会话视为不存在。
+    并发控制使用两把文件锁（见 session_lock / state_lock），锁文件与临时数据放在同一目录。
+    """
+    file_hash = models.CharField(max_length=64, unique=True)  # 文件的哈希值
+    total_chunks = models.PositiveIntegerField()  # 分片总数
+    chunk_size = models.PositiveBigIntegerField(null=True, blank=True)  # 分片大小（预分配模式必填）
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)  # 文件总大小（预分配模式必填）
+    received = models.BinaryField(default=b'')  # 已接收分片位图
+    received_count = models.PositiveIntegerField(default=0)  # 已接收分片数
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE, related_name='upload_sessions'
+    )  # 创建会话的用户，匿名上传为空
+    expires_at = models.DateTimeField(db_index=True)  # 过期时间，每收到一个分片顺延
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.file_hash} ({self.received_count}/{self.total_chunks})'
+
+    @property
+    def bitmap(self):
+        return ChunkBitmap(self.total_chunks, bytes(self.received))
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+    def is_accessible_by(self, user):
+        """
+        有所属用户的会话只允许该用户续传；匿名会话不限制。
+        """
+        return self.owner_id is None or (user.is_authenticated and user.pk == self.owner_id)
+
+    def discard(self):
+        """
+        删除会话及其临时数据（分片目录、预分配文件和锁文件），调用方需持有独占的 session_lock。
+        """
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, 'temp', self.file_hash), ignore_errors=True)
+        try:
+            os.remove(assembly_path(self.file_hash))
+        except FileNotFoundError:
+            pass
+        self.remove_lock_files(self.file_hash)
+        self.delete()
+
+    @classmethod
+    def remove_lock_files(cls, file_hash):
+        """
+        删除锁文件，调用方需持有独占的 session_lock（或上传已完成，锁不再保护任何数据）；
+        等待中的请求加锁后会发现文件已被删除并重新打开。
+        """
+        for path in cls.lock_paths(file_hash):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                # Windows 上无法删除仍被其它请求打开的文件，留给之后的清理
+                pass
+
+    @staticmethod
+    def lock_paths(file_hash):
+        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
+        return os.path.join(temp_dir, f'{file_hash}.session.lock'), os.path.join(temp_dir, f'{file_hash}.state.lock')
+
+    @classmethod
+    def session_lock(cls, file_hash, exclusive=False):
+        """
+        会话锁：写分片时共享、完成上传时独占。
+        完成上传会等待进行中的分片写完，合并期间到达的分片请求等待合并结束。
+        """
+        return file_lock(cls.lock_paths(file_hash)[0], exclusive)
+
+    @classmethod
+    def state_lock(cls, file_hash):
+        """
+        会话状态锁：读取、校验和更新会话行在此串行，分片数据的写入不持有该锁，可以并行。
+        """
+        return file_lock(cls.lock_paths(file_hash)[1])
+
+    @classmethod
+    def get_active(cls, file_hash):
+        return cls.objects.filter(file_hash=file_hash, expires_at__gt=timezone.now()).first()
+
+    @classmethod
+    def record_chunk(cls, file_hash, chunk_index, total_chunks, chunk_size=None, file_size=None, owner=None):
+        """
+        在行锁内读-改-写位图，并发的分片请求不会互相覆盖已接收的位。
+        会话不存在或已过期时按本次请求的参数（重新）创建。调用方需持有 state_lock。
+        :raises UploadSessionMismatch: 会话参数与本次请求不一致
+        :return: 更新后的会话
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            session, created = cls.objects.select_for_update().get_or_create(
+                file_hash=file_hash,
+                defaults={
+                    'total_chunks': total_chunks, 'chunk_size': chunk_size, 'file_size': file_size,
+                    'owner': owner, 'expires_at': now,
+                },
+            )
+            if not created and session.expires_at <= now:
+                session.total_chunks, session.chunk_size, session.file_size = total_chunks, chunk_size, file_size
+                session.owner = owner
+                session.received, session.received_count = b'', 0
+            elif (session.total_chunks, session.chunk_size) != (total_chunks, chunk_size):
+                raise UploadSessionMismatch(file_hash)
+
+            bitmap = session.bitmap
+            bitmap.add(chunk_index)
+            session.received = bitmap.to_bytes()
+            session.received_count = bitmap.count()
+            session.expires_at = now + get_upload_session_ttl()
+            session.save()
+        return session
@@ -1,3 +1,90 @@
-from django.test import TestCase
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from .models import File, UploadSession
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='upload-tests-')
+
+
+@override_settings(ROOT_URLCONF='upload_files_app.urls', MEDIA_ROOT=MEDIA_ROOT)
+class ParallelChunkUploadTests(TransactionTestCase):
+    """
+    同一个上传会话的数百个分片请求并发到达（含同一分片的重复请求），合并结果的哈希必须正确。
+    """
+    chunk_size = 4096
+    total_chunks = 256
+    duplicate_chunks = 64
+    workers = 32
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.data = os.urandom(self.chunk_size * self.total_chunks - 123)
+        self.file_hash = hashlib.sha256(self.data).hexdigest()
+
+    def post_chunk(self, chunk_index):
+        try:
+            offset = chunk_index * self.chunk_size
+            return APIClient().post('/upload/files', {
+                'file': SimpleUploadedFile('chunk', self.data[offset:offset + self.chunk_size]),
+                'chunkIndex': chunk_index,
+                'fileHash': self.file_hash,
+                'totalChunks': self.total_chunks,
+                'chunkSize': self.chunk_size,
+                'fileSize': len(self.data),
+            }, format='multipart').status_code
+        finally:
+            connection.close()
+
+    def complete(self, _):
+        try:
+            return APIClient().post('/upload/complete', {
+                'fileHash': self.file_hash, 'fileExtension': 'bin', 'fileName': 'stress.bin',
+            }).data
+        finally:
+            connection.close()
+
+    def assert_parallel_upload(self):
+        indexes = list(range(self.total_chunks)) + random.sample(range(self.total_chunks), self.duplicate_chunks)
+        random.shuffle(indexes)
+        with ThreadPoolExecutor(self.workers) as executor:
+            status_codes = list(executor.map(self.post_chunk, indexes))
+        self.assertEqual(set(status_codes), {200})
+
+        session = UploadSession.objects.get(file_hash=self.file_hash)
+        self.assertEqual(session.received_count, self.total_chunks)
+
+        # 并发的完成请求只合并一次，其余返回已存在的文件
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(self.complete, range(4)))
+        self.assertEqual(sorted(result['message'] for result in results),
+                         ['File already exists'] * 3 + ['Upload complete'])
+        merged = next(result for result in results if result['message'] == 'Upload complete')
+        self.assertEqual(merged['sha256'], self.file_hash)
+
+        output_path = os.path.join(settings.MEDIA_ROOT, 'uploads', 'others', f'{self.file_hash}.bin')
+        with open(output_path, 'rb') as f:
+            self.assertEqual(hashlib.sha256(f.read()).hexdigest(), self.file_hash)
+        self.assertEqual(File.objects.filter(file_hash=self.file_hash).count(), 1)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, 'temp')), [])
+
+    def test_parallel_chunks(self):
+        self.assert_parallel_upload()
+
+    @override_settings(UPLOAD_ASSEMBLY_MODE='preallocate')
+    def test_parallel_preallocated_chunks(self):
+        self.assert_parallel_upload()
@@ -0,0 +1,231 @@
+# upload_files_app/utils.py
+# ==========================
+# Streaming File Storage / 流式文件存储
+# ==========================
+
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def stream_to_temp_file(uploaded_file, directory):
+    """
+    边写临时文件边计算 SHA-256：逐块读取上传文件，每个字节只读取、哈希一次，内存中最多只有一个块。
+    临时文件与目标文件在同一目录，之后可以原子重命名。
+    :param uploaded_file: Django UploadedFile
+    :param directory: 临时文件所在目录（需与最终文件在同一文件系统）
+    :return: (文件哈希, 临时文件路径)
+    """
+    os.makedirs(directory, exist_ok=True)
+    hasher = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            for chunk in uploaded_file.chunks():
+                hasher.update(chunk)
+                temp_file.write(chunk)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+    except BaseException:
+        remove_quietly(temp_path)
+        raise
+    return hasher.hexdigest(), temp_path
+
+
+def commit_temp_file(temp_path, final_path):
+    """
+    将临时文件原子地重命名为最终路径（以内容哈希命名），读者不会看到写了一半的文件。
+    """
+    os.replace(temp_path, final_path)
+    return final_path
+
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def write_file_atomic(uploaded_file, final_path):
+    """
+    先写同目录下的临时文件再原子重命名：同一分片的并发请求各自写临时文件，
+    最终文件只会是某一次完整的写入，不会出现交错或写了一半的内容。
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(final_path), prefix='.chunk-', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            for chunk in uploaded_file.chunks():
+                temp_file.write(chunk)
+    except BaseException:
+        remove_quietly(temp_path)
+        raise
+    return commit_temp_file(temp_path, final_path)
+
+
+# ==========================
+# File Lock / 文件锁
+# ==========================
+
+# Windows 上等待锁的轮询间隔（秒）
+LOCK_POLL_INTERVAL = 0.01
+
+
+def _lock_fd(fd, exclusive):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return
+    # msvcrt 只支持独占锁，共享锁退化为独占锁（Windows 上同一会话的分片依次写入）；
+    # LK_LOCK 只重试 10 秒，这里用非阻塞方式轮询，等待时间不受限制
+    while True:
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            time.sleep(LOCK_POLL_INTERVAL)
+
+
+def _unlock_fd(fd):
+    if fcntl is None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path, exclusive=True):
+    """
+    文件锁（flock，Windows 上为 msvcrt.locking）。锁属于打开的文件描述，同一进程的不同线程、不同进程之间都互斥；
+    同一线程重复加同一把锁会阻塞自己，调用方不要嵌套。
+    锁文件可能被持锁者删除（上传完成时清理），加锁后检查路径仍指向同一个文件，否则重新打开再加锁。
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _lock_fd(fd, exclusive)
+            locked = os.fstat(fd)
+            current = os.stat(path)
+            if (locked.st_dev, locked.st_ino) == (current.st_dev, current.st_ino):
+                break
+            _unlock_fd(fd)
+        except FileNotFoundError:
+            _unlock_fd(fd)
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
+    try:
+        yield
+    finally:
+        # 关闭文件描述即释放 flock 锁
+        _unlock_fd(fd)
+        os.close(fd)
+
+
+# ==========================
+# Chunk Merge / 分片合并
+# ==========================
+
+CHUNK_FILE_PREFIX = 'chunk_'
+# fileHash 会拼接到存储路径中，只允许十六进制字符；长度上限与 File.file_hash（max_length=64）一致，
+# 避免合并完成后才在写入数据库时失败
+FILE_HASH_RE = re.compile(r'^[0-9a-fA-F]{16,64}$')
+# 无法零拷贝时回退到用户态复制的缓冲区大小
+MERGE_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+def is_valid_file_hash(file_hash):
+    return bool(file_hash) and bool(FILE_HASH_RE.match(file_hash))
+
+
+def is_sha256(file_hash):
+    return is_valid_file_hash(file_hash) and len(file_hash) == 64
+
+
+def chunk_file_path(temp_dir, chunk_index):
+    return os.path.join(temp_dir, f'{CHUNK_FILE_PREFIX}{chunk_index}')
+
+
+def _copy_zero_copy(src_fd, dst_fd, size):
+    """
+    在内核中复制 size 字节（copy_file_range，不支持时 sendfile），数据不经过用户态。
+    不支持零拷贝时（包括 Windows 上两者都不存在）返回 False，调用方回退到缓冲区复制。
+    """
+    if not hasattr(os, 'copy_file_range') and not hasattr(os, 'sendfile'):
+        return False
+    copied = 0
+    try:
+        if hasattr(os, 'copy_file_range'):
+            while copied < size:
+                count = os.copy_file_range(src_fd, dst_fd, size - copied)
+                if not count:
+                    break
+                copied += count
+        else:
+            while copied < size:
+                count = os.sendfile(dst_fd, src_fd, copied, size - copied)
+                if not count:
+                    break
+                copied += count
+                os.lseek(src_fd, copied, os.SEEK_SET)
+    except OSError:
+        if copied:
+            raise
+        return False
+    if copied and copied != size:
+        raise OSError(f'Short copy: {copied} of {size} bytes')
+    return copied == size
+
+
+def merge_chunks(chunk_paths, directory):
+    """
+    将分片按顺序合并到 directory 下的临时文件，合并过程中计算 SHA-256，不需要再次读取合并结果。
+    优先零拷贝（copy_file_range / sendfile），哈希通过 mmap 直接读取页缓存；
+    不支持时回退到大缓冲区复制，从同一个缓冲区计算哈希。
+    :return: (SHA-256, 临时文件路径)，由调用方校验后 commit_temp_file
+    """
+    os.makedirs(directory, exist_ok=True)
+    hasher = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.merge-', suffix='.part')
+    zero_copy = True
+    buffer = None
+    try:
+        with os.fdopen(fd, 'wb') as output_file:
+            dst_fd = output_file.fileno()
+            for chunk_path in chunk_paths:
+                with open(chunk_path, 'rb') as chunk_file:
+                    src_fd = chunk_file.fileno()
+                    size = os.fstat(src_fd).st_size
+                    if not size:
+                        continue
+                    if zero_copy and _copy_zero_copy(src_fd, dst_fd, size):
+                        with mmap.mmap(src_fd, 0, access=mmap.ACCESS_READ) as mapped:
+                            hasher.update(mapped)
+                        continue
+
+                    zero_copy = False
+                    if buffer is None:
+                        buffer = memoryview(bytearray(MERGE_BUFFER_SIZE))
+                    while True:
+                        count = chunk_file.readinto(buffer)
+                        if not count:
+                            break
+                        hasher.update(buffer[:count])
+                        output_file.write(buffer[:count])
+            output_file.flush()
+            os.fsync(dst_fd)
+    except BaseException:
+        remove_quietly(temp_path)
+        raise
+    return hasher.hexdigest(), temp_path
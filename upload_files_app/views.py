@@ -3,7 +3,6 @@ from django.shortcuts import render
 
 # Create your views here.
 import os
-import hashlib
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
@@ -12,8 +11,11 @@ from django.conf import settings
 # ==========================
 # 普通文件上传
 # ==========================
-from .models import File
+from .models import File, UploadSession, UploadSessionMismatch
 from .serializers import FileSerializer
+from .utils import stream_to_temp_file, commit_temp_file, remove_quietly, merge_chunks, chunk_file_path, \
+    write_file_atomic, is_valid_file_hash, is_sha256
+from . import assembly
 class UploadFileView(APIView):
     """
     视图作用：
@@ -42,14 +44,17 @@ class UploadFileView(APIView):
                 'error': f'The file is too large. Maximum allowed size for {file_type} is {max_size / 1024 / 1024} MB.'
             }, status=400)
 
-        # 计算文件的哈希值
-        file_data = uploaded_file.read()
-        file_hash = hashlib.sha256(file_data).hexdigest()
+        # 确定文件存储路径
+        output_dir = os.path.join(settings.MEDIA_ROOT, 'uploads', 'files', file_type)
+
+        # 逐块写入同目录下的临时文件，同时计算哈希值（不把整个文件读入内存）
+        file_hash, temp_path = stream_to_temp_file(uploaded_file, output_dir)
 
         # 检查文件是否已存在于数据库
         existing_file = File.objects.filter(file_hash=file_hash).first()
 
         if existing_file:
+            remove_quietly(temp_path)
             # 如果文件已经存在，返回已存在的文件路径
             # 如果文件已经存在，使用序列化器返回文件信息
             serializer = FileSerializer(existing_file)
@@ -60,18 +65,13 @@ class UploadFileView(APIView):
                 'fileName': serializer.data['file_name']
             })
 
-        # 确定文件存储路径
-        output_dir = os.path.join(settings.MEDIA_ROOT, 'uploads', 'files', file_type)
-        print(output_dir,'output_idr')
-        os.makedirs(output_dir, exist_ok=True)
         output_file_path = os.path.join(output_dir, f"{file_hash}{os.path.splitext(uploaded_file.name)[1]}")
 
-        # 保存文件到目标路径
-        with open(output_file_path, 'wb') as f:
-            f.write(file_data)
+        # 原子重命名为以哈希命名的最终文件
+        commit_temp_file(temp_path, output_file_path)
 
-        # 创建文件记录并保存
-        file_record = File.create_file_record(uploaded_file, output_file_path)
+        # 创建文件记录并保存（哈希已在写入时算出，不再重新读取文件）
+        file_record = File.create_file_record(uploaded_file, output_file_path, file_hash=file_hash)
 
         # 使用序列化器返回响应
         serializer = FileSerializer(file_record)
@@ -118,7 +118,7 @@ class UploadChunkView(APIView):
 
     def post(self, request):
         """
-        上传文件分块
+        上传文件分块，并在上传会话的位图中标记该分块
         """
         file = request.FILES.get('file')
         chunk_index = request.data.get('chunkIndex')
@@ -127,24 +127,83 @@ class UploadChunkView(APIView):
 
         if not all([file, chunk_index, file_hash, total_chunks]):
             return Response({'error': 'Missing required parameters'}, status=400)
-
-        # 动态设置存储路径
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp', file_hash)
-        os.makedirs(temp_dir, exist_ok=True)
-
-        # 保存分块到临时目录
-        chunk_path = os.path.join(temp_dir, f'chunk_{chunk_index}')
-        with open(chunk_path, 'wb') as f:
-            for chunk in file.chunks():
-                f.write(chunk)
-
-        return Response({'message': 'Chunk uploaded successfully'})
+        if not is_valid_file_hash(file_hash):
+            return Response({'error': 'Invalid fileHash'}, status=400)
+        try:
+            chunk_index, total_chunks = int(chunk_index), int(total_chunks)
+            if not 0 <= chunk_index < total_chunks:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'Invalid chunkIndex or totalChunks'}, status=400)
+
+        preallocated = assembly.get_assembly_mode() == assembly.ASSEMBLY_MODE_PREALLOCATE
+        chunk_size = file_size = None
+        if preallocated:
+            try:
+                chunk_size = int(request.data.get('chunkSize'))
+                file_size = int(request.data.get('fileSize'))
+                if total_chunks != assembly.chunk_layout(file_size, chunk_size):
+                    raise ValueError
+            except (TypeError, ValueError):
+                return Response({'error': 'Invalid chunkSize, fileSize or totalChunks'}, status=400)
+            if file.size != assembly.expected_chunk_length(chunk_index, file_size, chunk_size):
+                return Response({'error': 'Invalid chunk size'}, status=400)
+
+        owner = request.user if request.user.is_authenticated else None
+        # 写分片期间持有共享的会话锁，完成上传（独占）不会在分片写到一半时开始合并
+        with UploadSession.session_lock(file_hash):
+            with UploadSession.state_lock(file_hash):
+                rejected = self.check_upload_state(request, file_hash, total_chunks, chunk_size)
+                if rejected is not None:
+                    if not UploadSession.objects.filter(file_hash=file_hash).exists():
+                        # 没有会话（上传已完成）时锁文件不会被 clean_upload_sessions 清理，
+                        # 且已不再保护任何数据，直接删除；有会话时随会话一起清理
+                        UploadSession.remove_lock_files(file_hash)
+                    return rejected
+
+            if preallocated:
+                # 分片直接 pwrite 到目标文件的 chunkIndex * chunkSize 偏移处，不同分片的写入区间互不重叠
+                part_path = assembly.assembly_path(file_hash)
+                assembly.preallocate(part_path, file_size)
+                assembly.write_chunk_at(part_path, chunk_index * chunk_size, file)
+            else:
+                # 动态设置存储路径
+                temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp', file_hash)
+                os.makedirs(temp_dir, exist_ok=True)
+
+                # 先写临时文件再重命名为分块文件，同一分块的并发请求不会写出交错的内容
+                write_file_atomic(file, chunk_file_path(temp_dir, chunk_index))
+
+            with UploadSession.state_lock(file_hash):
+                try:
+                    session = UploadSession.record_chunk(
+                        file_hash, chunk_index, total_chunks, chunk_size, file_size, owner=owner
+                    )
+                except UploadSessionMismatch:
+                    return Response({'error': 'Upload session parameters do not match'}, status=409)
+
+        return Response({'message': 'Chunk uploaded successfully', 'uploadedCount': session.received_count})
+
+    def check_upload_state(self, request, file_hash, total_chunks, chunk_size):
+        """
+        检查文件是否已上传完成、会话归属和参数，避免按错误的偏移写入他人的上传
+        :return: 拒绝时返回 Response，否则返回 None
+        """
+        if File.objects.filter(file_hash=file_hash).exists():
+            return Response({'message': 'File already exists', 'uploadedChunks': 'completed'})
+        session = UploadSession.get_active(file_hash)
+        if session is not None:
+            if not session.is_accessible_by(request.user):
+                return Response({'error': 'Upload session belongs to another user'}, status=403)
+            if (session.total_chunks, session.chunk_size) != (total_chunks, chunk_size):
+                return Response({'error': 'Upload session parameters do not match'}, status=409)
+        return None
 
 
 class GetUploadedChunksView(APIView):
     def get(self, request):
         """
-        查询已上传的分块索引
+        查询已上传的分块索引（只读取上传会话，不访问文件系统）
         """
         file_hash = request.query_params.get('fileHash')
         if not file_hash:
@@ -161,18 +220,17 @@ class GetUploadedChunksView(APIView):
         except File.DoesNotExist:
             pass
 
-        # 检查临时目录中的分块
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp', file_hash)
-        if not os.path.exists(temp_dir):
+        session = UploadSession.get_active(file_hash)
+        if session is None:
             return Response({'uploadedChunks': []})
+        if not session.is_accessible_by(request.user):
+            return Response({'error': 'Upload session belongs to another user'}, status=403)
 
-        uploaded_chunks = [
-            int(filename.split('_')[1])
-            for filename in os.listdir(temp_dir)
-            if filename.startswith('chunk_')
-        ]
-        uploaded_chunks.sort()
-        return Response({'uploadedChunks': uploaded_chunks})
+        return Response({
+            'uploadedChunks': session.bitmap.received(),
+            'totalChunks': session.total_chunks,
+            'chunkSize': session.chunk_size,
+        })
 
 
 class CompleteUploadView(APIView):
@@ -186,11 +244,32 @@ class CompleteUploadView(APIView):
 
         if not all([file_hash, file_extension, file_name]):
             return Response({'error': 'Missing required parameters'}, status=400)
+        if not is_valid_file_hash(file_hash) or not file_extension.isalnum():
+            return Response({'error': 'Invalid fileHash or fileExtension'}, status=400)
+
+        # 独占会话锁：等待进行中的分片写完，合并期间不接收新的分片；重复的完成请求依次执行
+        with UploadSession.session_lock(file_hash, exclusive=True):
+            return self.complete(request, file_hash, file_extension, file_name)
+
+    def complete(self, request, file_hash, file_extension, file_name):
+        # 并发的完成请求中已有一个完成了合并
+        existing_file = File.objects.filter(file_hash=file_hash).first()
+        if existing_file:
+            UploadSession.remove_lock_files(file_hash)
+            return Response({'message': 'File already exists', 'file': FileSerializer(existing_file).data})
 
-        # 确保临时目录存在
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp', file_hash)
-        if not os.path.exists(temp_dir):
+        session = UploadSession.get_active(file_hash)
+        if session is None:
+            # 没有会话时锁文件是本次请求创建的，不会被 clean_upload_sessions 清理
+            UploadSession.remove_lock_files(file_hash)
             return Response({'error': 'No uploaded chunks found'}, status=400)
+        if not session.is_accessible_by(request.user):
+            return Response({'error': 'Upload session belongs to another user'}, status=403)
+
+        # 按会话位图校验分片是否齐全
+        bitmap = session.bitmap
+        if not bitmap.is_complete():
+            return Response({'error': 'Upload incomplete', 'missingChunks': bitmap.missing()}, status=400)
 
         # 确保输出目录存在
         file_type = get_file_type(SimpleUploadedFile(f'temp.{file_extension}', b''))
@@ -200,20 +279,28 @@ class CompleteUploadView(APIView):
         # 动态设置完整文件路径
         output_file_path = os.path.join(output_dir, f'{file_hash}.{file_extension}')
 
-        # 按分块顺序合并文件
-        chunk_files = sorted(
-            [os.path.join(temp_dir, f) for f in os.listdir(temp_dir)],
-            key=lambda x: int(os.path.basename(x).split('_')[1])
-        )
-        with open(output_file_path, 'wb') as output_file:
-            for chunk_file in chunk_files:
-                with open(chunk_file, 'rb') as f:
-                    output_file.write(f.read())
-
-        # 清理临时目录
-        for chunk_file in chunk_files:
-            os.remove(chunk_file)
-        os.rmdir(temp_dir)
+        try:
+            if assembly.get_assembly_mode() == assembly.ASSEMBLY_MODE_PREALLOCATE:
+                # 分片已按偏移写入目标文件，只需顺序读取一次计算哈希
+                temp_path = assembly.assembly_path(file_hash)
+                sha256 = assembly.hash_file(temp_path)
+            else:
+                # 按分块顺序合并文件，合并的同时计算 SHA-256
+                temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp', file_hash)
+                chunk_files = [chunk_file_path(temp_dir, index) for index in range(session.total_chunks)]
+                sha256, temp_path = merge_chunks(chunk_files, output_dir)
+        except FileNotFoundError:
+            # 会话记录的分片在磁盘上已不存在（例如被清理），只能重新上传
+            session.discard()
+            return Response({'error': 'Uploaded chunks are missing, please upload again'}, status=400)
+
+        # fileHash 为 SHA-256 时校验合并结果，不一致说明分片损坏，丢弃本次上传
+        if is_sha256(file_hash) and sha256 != file_hash.lower():
+            remove_quietly(temp_path)
+            session.discard()
+            return Response({'error': 'File hash mismatch, please upload again'}, status=400)
+
+        commit_temp_file(temp_path, output_file_path)
 
         # 保存文件记录到数据库
         file_record = File.objects.create(
@@ -223,7 +310,11 @@ class CompleteUploadView(APIView):
         )
         file_serializer = FileSerializer(file_record)
 
+        # 清理临时数据和上传会话（会删除锁文件，必须是持锁期间的最后一步）
+        session.discard()
+
         return Response({
             'message': 'Upload complete',
-            'file': file_serializer.data
-        })
\ No newline at end of file
+            'file': file_serializer.data,
+            'sha256': sha256
+        })